@@ -0,0 +1,151 @@
+import os
+import re
+from collections import Counter
+from backend.client import get_client
+
+# Keeps agent context from growing across simulations. Every interaction otherwise adds
+# a prompt, tool calls and a reply to the agent's message history, and the agent may
+# keep appending to its interaction_history block, so each run costs more than the last.
+#
+# AGENT_MEMORY_MODE:
+#   persistent - leave memory alone (the original behaviour, and the default)
+#   bounded    - keep a fixed-size digest of reactions (the most recent ones, plus
+#                running totals for older ones) in interaction_history after each ad,
+#                alongside whatever else the block holds, and reset the message
+#                history every MEMORY_RESET_EVERY interactions, once the digest has
+#                captured them
+#   stateless  - reset the message history after every ad, so each ad is judged fresh
+# bounded and stateless trade the agents' own recollection for flat per-call cost, so
+# they are opt-in.
+
+AGENT_MEMORY_MODE = os.getenv("AGENT_MEMORY_MODE", "persistent")
+HISTORY_LABEL = "interaction_history"
+# Character cap on the interaction_history block.
+INTERACTION_HISTORY_LIMIT = int(os.getenv("INTERACTION_HISTORY_LIMIT", "2000"))
+MEMORY_DIGEST_RECENT = int(os.getenv("MEMORY_DIGEST_RECENT", "8"))
+MEMORY_RESET_EVERY = int(os.getenv("MEMORY_RESET_EVERY", "5"))
+
+DIGEST_HEADER = "Your past ad reactions (older ones are summarized):"
+_RECENT_RE = re.compile(r"^- (?P<ad_id>\S+): (?P<reaction>[a-z]+)(?: \((?P<confidence>[\d.]+)\))?(?: \[(?P<tags>[^\]]*)\])?$")
+_EARLIER_RE = re.compile(r"^Earlier \((?P<total>\d+) ads\): (?P<counts>.*?)(?:; tags: (?P<tags>.*))?$")
+
+
+def parse_digest(text: str) -> dict:
+    """
+    Reads a digest written by render_digest. Lines in any other format (the block's
+    initial text, or notes the agent wrote with core_memory_append) are kept in
+    'notes' in their original order, and only dropped if the block runs out of room.
+    """
+    digest = {"notes": [], "recent": [], "earlier": 0, "earlier_reactions": Counter(), "earlier_tags": Counter()}
+    for raw_line in (text or "").splitlines():
+        line = raw_line.strip()
+        recent = _RECENT_RE.match(line)
+        earlier = _EARLIER_RE.match(line)
+        if recent:
+            digest["recent"].append(line)
+        elif earlier:
+            digest["earlier"] = int(earlier.group("total"))
+            digest["earlier_reactions"] = _parse_counts(earlier.group("counts"))
+            digest["earlier_tags"] = _parse_counts(earlier.group("tags") or "")
+        elif line != DIGEST_HEADER:
+            digest["notes"].append(raw_line.rstrip())
+    return digest
+
+
+def _parse_counts(text: str) -> Counter:
+    counts = Counter()
+    for part in text.split(","):
+        name, _, count = part.strip().rpartition(" ")
+        if name and count.isdigit():
+            counts[name] = int(count)
+    return counts
+
+
+def _format_counts(counts: Counter, limit: int = None) -> str:
+    return ", ".join(f"{name} {count}" for name, count in counts.most_common(limit))
+
+
+def render_digest(digest: dict, limit: int = INTERACTION_HISTORY_LIMIT) -> str:
+    """
+    Writes a digest back out after its notes, within `limit` characters: the oldest
+    recent lines are folded into the totals first, then the oldest notes are dropped
+    (the newest one is cut short if even it doesn't fit).
+    """
+    notes = digest.get("notes", [])
+    while True:
+        lines = [DIGEST_HEADER]
+        if digest["earlier"]:
+            earlier = f"Earlier ({digest['earlier']} ads): {_format_counts(digest['earlier_reactions'])}"
+            if digest["earlier_tags"]:
+                earlier += f"; tags: {_format_counts(digest['earlier_tags'], 5)}"
+            lines.append(earlier)
+        lines.extend(digest["recent"])
+        body = "\n".join(lines)
+        notes_length = len("\n".join(notes)) + 1 if notes else 0
+        if notes_length + len(body) <= limit or not digest["recent"]:
+            break
+        _fold_oldest(digest)
+    kept = _newest_notes(notes, limit - len(body) - 1)
+    return ("\n".join(kept + [body]))[:limit]
+
+
+def _newest_notes(notes: list, budget: int) -> list:
+    """The most recent notes that fit in `budget` characters (joined by newlines)."""
+    kept, used = [], 0
+    for line in reversed(notes):
+        cost = len(line) + (1 if kept else 0)
+        if used + cost > budget:
+            break
+        kept.insert(0, line)
+        used += cost
+    if not kept and notes and budget > 0:
+        kept = [notes[-1][:budget]]
+    return kept
+
+
+def _fold_oldest(digest: dict):
+    match = _RECENT_RE.match(digest["recent"].pop(0))
+    digest["earlier"] += 1
+    digest["earlier_reactions"][match.group("reaction")] += 1
+    for tag in filter(None, (t.strip() for t in (match.group("tags") or "").split(","))):
+        digest["earlier_tags"][tag] += 1
+
+
+def add_to_digest(text: str, ad_id: str, reaction: dict, recent: int = MEMORY_DIGEST_RECENT,
+                  limit: int = INTERACTION_HISTORY_LIMIT):
+    """Adds one reaction to a digest; returns (new text, total interactions recorded)."""
+    digest = parse_digest(text)
+    ad_id = re.sub(r"\s+", "_", str(ad_id))
+    line = f"- {ad_id}: {reaction.get('reaction')}"
+    if reaction.get("confidence") is not None:
+        line += f" ({reaction['confidence']})"
+    tags = [str(tag).replace(",", " ").replace("]", " ").strip() for tag in reaction.get("tags") or []]
+    if tags:
+        line += f" [{', '.join(tags[:5])}]"
+    digest["recent"].append(line)
+    while len(digest["recent"]) > recent:
+        _fold_oldest(digest)
+    return render_digest(digest, limit), digest["earlier"] + len(digest["recent"])
+
+
+def after_interaction(agent, ad_id: str, reaction, mode: str = None):
+    """
+    Applies the memory mode once an agent has answered an ad (`reaction` is None if
+    it failed). Blocking; runs on the interaction's worker thread. Failures are
+    logged rather than raised, since the reaction itself was already collected.
+    """
+    mode = mode or AGENT_MEMORY_MODE
+    client = get_client()
+    try:
+        if mode == "stateless":
+            # Agents created in stateless mode clear their own buffer after each turn.
+            if not getattr(agent, "message_buffer_autoclear", False):
+                client.agents.messages.reset(agent.id)
+        elif mode == "bounded" and reaction:
+            block = client.agents.blocks.retrieve(agent.id, HISTORY_LABEL)
+            value, total = add_to_digest(block.value, ad_id, reaction)
+            client.agents.blocks.modify(agent.id, HISTORY_LABEL, value=value, limit=INTERACTION_HISTORY_LIMIT)
+            if total % MEMORY_RESET_EVERY == 0:
+                client.agents.messages.reset(agent.id)
+    except Exception as e:
+        print(f"  - Warning: Could not compact memory for agent '{agent.name}': {e}")
@@ -0,0 +1,124 @@
+import os
+import time
+import threading
+from backend.client import get_client
+from backend.prompts import agent_template_version, parse_persona, persona_block_text
+
+# An in-process registry of the server's agents: id, name, tags and persona text. It is
+# loaded once with paginated list calls that include each agent's memory, so results
+# can carry real persona descriptions without a per-agent fetch. create_agents keeps it
+# current by adding and removing agents as it creates and deletes them; a full reload
+# only happens on request or after AGENT_REGISTRY_TTL, to pick up changes made elsewhere.
+
+AGENT_REGISTRY_TTL = float(os.getenv("AGENT_REGISTRY_TTL", "600"))
+LIST_PAGE_SIZE = 100
+# Relationships the registry needs from agents.list; skipping the rest (tools, sources) keeps pages light.
+LIST_RELATIONSHIPS = ["memory", "tags"]
+
+
+def list_all_agents(page_size: int = LIST_PAGE_SIZE, **kwargs):
+    """Lists every agent on the server, following the pagination cursor. `kwargs` go to agents.list."""
+    client = get_client()
+    agents = []
+    after = None
+    while True:
+        page = client.agents.list(limit=page_size, after=after, **kwargs) if after else client.agents.list(
+            limit=page_size, **kwargs)
+        agents.extend(page)
+        if len(page) < page_size:
+            return agents
+        after = page[-1].id
+
+
+class AgentRecord:
+    """The parts of an agent's state that simulations use, without its tools or full memory."""
+
+    __slots__ = ("id", "name", "tags", "created_at", "message_buffer_autoclear", "persona", "description",
+                 "model", "embedding")
+
+    def __init__(self, id: str, name: str, tags: list = None, created_at=None,
+                 message_buffer_autoclear: bool = False, persona: str = None, model: str = None,
+                 embedding: str = None):
+        self.id = id
+        self.name = name
+        self.tags = list(tags or [])
+        self.created_at = created_at
+        self.message_buffer_autoclear = message_buffer_autoclear
+        self.persona = persona
+        # Model and embedding handles (as in AGENT_CONFIG); None if the server didn't report one.
+        self.model = model
+        self.embedding = embedding
+        # The personality text the persona was built from, or the whole block if it doesn't match a template.
+        self.description = parse_persona(persona, agent_template_version(self)) if persona is not None else None
+
+    @classmethod
+    def from_state(cls, agent):
+        """Builds a record from an agent returned by agents.list or agents.create."""
+        return cls(agent.id, agent.name, getattr(agent, "tags", None), getattr(agent, "created_at", None),
+                   bool(getattr(agent, "message_buffer_autoclear", False)), persona_block_text(agent),
+                   getattr(getattr(agent, "llm_config", None), "handle", None),
+                   getattr(getattr(agent, "embedding_config", None), "handle", None))
+
+
+class AgentRegistry:
+    """Thread-safe cache of AgentRecords, keyed by agent id in listing order."""
+
+    def __init__(self, ttl: float = AGENT_REGISTRY_TTL):
+        self.ttl = ttl
+        self.loads = 0
+        self._lock = threading.Lock()
+        self._agents = {}
+        self._loaded_at = None
+
+    def agents(self, refresh: bool = False) -> list:
+        """Returns every registered agent, loading them first if needed, stale or `refresh` is set."""
+        with self._lock:
+            fresh = self._loaded_at is not None and time.monotonic() - self._loaded_at <= self.ttl
+            if fresh and not refresh:
+                return list(self._agents.values())
+        self.load()
+        with self._lock:
+            return list(self._agents.values())
+
+    def load(self):
+        """Replaces the registry with a full paginated listing of the server's agents."""
+        agents = list_all_agents(include_relationships=LIST_RELATIONSHIPS)
+        records = [AgentRecord.from_state(agent) for agent in agents]
+        with self._lock:
+            self._agents = {record.id: record for record in records}
+            self._loaded_at = time.monotonic()
+            self.loads += 1
+
+    def get(self, agent_id: str):
+        with self._lock:
+            return self._agents.get(agent_id)
+
+    def add(self, agent):
+        """Registers a newly created agent. Ignored until the registry has been loaded."""
+        record = AgentRecord.from_state(agent)
+        with self._lock:
+            if self._loaded_at is not None:
+                self._agents[record.id] = record
+
+    def patch(self, agent_id: str, **fields):
+        """Updates fields of a registered agent's record after an in-place edit (e.g. persona=...)."""
+        with self._lock:
+            record = self._agents.get(agent_id)
+            if record is None:
+                return
+            for field, value in fields.items():
+                setattr(record, field, value)
+            if "persona" in fields:
+                record.description = parse_persona(record.persona, agent_template_version(record))
+
+    def remove(self, agent_id: str):
+        with self._lock:
+            self._agents.pop(agent_id, None)
+
+    def invalidate(self):
+        """Forces a full reload on the next agents() call."""
+        with self._lock:
+            self._loaded_at = None
+
+
+AGENT_REGISTRY = AgentRegistry()
@@ -0,0 +1,191 @@
+import os
+import json
+from itertools import chain
+from statistics import NormalDist
+import numpy as np
+import pandas as pd
+from backend.reaction_parser import DEFAULT_CONFIDENCE, REACTION_PRIORITY, TOOL_REACTIONS
+
+# Aggregate analytics over simulation results. Results (the lists returned by
+# run_simulation_with_ad_copy, the JSONL logs written by result_sink, or the older CSV
+# logs in data/) are loaded into a columnar DataFrame and summarised per ad, per
+# persona or per tag with vectorized group-bys.
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+# How favourable each reaction is. The confidence-weighted score of a row is
+# REACTION_SCORES[reaction] * confidence / 100.
+REACTION_SCORES = {"like": 1.0, "repost": 1.0, "comment": 0.5, "ignore": 0.0, "dislike": -1.0}
+# DEFAULT_CONFIDENCE (from reaction_parser) fills in rows that carry no confidence, e.g.
+# reactions derived from tool calls before they were given one.
+GROUP_COLUMNS = {"ad": "ad_id", "persona": "agent_name", "tag": "tag"}
+# Groups at least this large get the closed-form bootstrap interval (see bootstrap_mean_ci),
+# as does every group once resampling work (groups x replicates x distinct score values)
+# would exceed the budget.
+BOOTSTRAP_NORMAL_MIN_N = 1000
+BOOTSTRAP_CELL_BUDGET = 20_000_000
+
+
+def results_to_frame(results: list) -> pd.DataFrame:
+    """Builds a normalized DataFrame from a list of result dicts."""
+    return normalize_frame(pd.DataFrame.from_records(results))
+
+
+def normalize_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Ensures the columns analytics relies on exist and have sane types."""
+    df = df.copy()
+    for column in ("ad_id", "agent_id", "agent_name", "reaction"):
+        if column not in df:
+            df[column] = None
+    df["ad_id"] = df["ad_id"].fillna("user_provided_ad")
+    # Only clean up the (rare) reactions that aren't already canonical.
+    messy = ~df["reaction"].isin(list(REACTION_SCORES))
+    if messy.any():
+        df.loc[messy, "reaction"] = df.loc[messy, "reaction"].astype(str).str.strip().str.lower()
+    df["confidence"] = pd.to_numeric(df.get("confidence"), errors="coerce").clip(0, 100)
+    if "tags" not in df:
+        df["tags"] = [[] for _ in range(len(df))]
+    df["tags"] = df["tags"].map(lambda tags: tags if isinstance(tags, list) else [])
+    return df[df["reaction"].isin(list(REACTION_SCORES))].reset_index(drop=True)
+
+
+def load_jsonl(path: str) -> pd.DataFrame:
+    """Loads a simulation_responses.jsonl log written by result_sink."""
+    return normalize_frame(pd.read_json(path, lines=True, dtype=False))
+
+
+def load_csv_logs(data_dir: str = DATA_DIR) -> pd.DataFrame:
+    """
+    Loads the legacy CSV logs. simulation_responses.csv has no reaction column, so
+    each (agent, ad) pair's primary reaction is derived from the tool calls in
+    simulation_interactions.csv.
+    """
+    responses = pd.read_csv(os.path.join(data_dir, 'simulation_responses.csv'))
+    interactions = pd.read_csv(os.path.join(data_dir, 'simulation_interactions.csv'))
+    interactions["reaction"] = interactions["tool_called"].map(TOOL_REACTIONS)
+    interactions = interactions.dropna(subset=["reaction"])
+    # The most expressive action is the primary reaction (same order as reaction_parser).
+    interactions["rank"] = interactions["reaction"].map({r: i for i, r in enumerate(REACTION_PRIORITY)})
+    primary = (interactions.sort_values("rank")
+               .drop_duplicates(["agent_id", "ad_id"])[["agent_id", "ad_id", "reaction"]])
+    merged = responses.merge(primary, on=["agent_id", "ad_id"], how="left")
+    merged = merged.rename(columns={"final_response": "final_message"})
+    return normalize_frame(merged)
+
+
+def load_results(source) -> pd.DataFrame:
+    """Loads results from a list of dicts, a .jsonl log, or a directory of CSV logs."""
+    if isinstance(source, pd.DataFrame):
+        return normalize_frame(source)
+    if isinstance(source, (list, tuple)):
+        return results_to_frame(list(source))
+    if os.path.isdir(source):
+        return load_csv_logs(source)
+    return load_jsonl(source)
+
+
+def add_scores(df: pd.DataFrame) -> pd.DataFrame:
+    """Adds the confidence-weighted `score` column."""
+    confidence = df["confidence"].fillna(DEFAULT_CONFIDENCE).to_numpy(dtype=float)
+    df = df.copy()
+    df["score"] = df["reaction"].map(REACTION_SCORES).to_numpy(dtype=float) * confidence / 100.0
+    return df
+
+
+def bootstrap_mean_ci(group_codes: np.ndarray, values: np.ndarray, n_groups: int,
+                      n_boot: int = 500, alpha: float = 0.05, seed: int = 0) -> np.ndarray:
+    """
+    Percentile bootstrap CIs for the mean of `values` within each group.
+    Scores take few distinct values, so instead of resampling rows we resample the
+    per-group counts of each distinct value with one multinomial draw per replicate,
+    which is exact and costs O(n_boot * distinct values) per group rather than
+    O(n_boot * rows). Groups of BOOTSTRAP_NORMAL_MIN_N or more rows, or any group once
+    the work would exceed BOOTSTRAP_CELL_BUDGET, use the closed-form bootstrap standard
+    error (plug-in standard deviation over sqrt(n)) with a normal quantile instead;
+    at those sizes the bootstrap distribution of a bounded mean is normal anyway.
+    Returns an (n_groups, 2) array of [low, high].
+    """
+    support, value_codes = np.unique(values, return_inverse=True)
+    counts = np.bincount(group_codes * len(support) + value_codes,
+                         minlength=n_groups * len(support)).reshape(n_groups, len(support)).astype(float)
+    totals = counts.sum(axis=1)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = counts @ support / totals
+        variances = counts @ support ** 2 / totals - means ** 2
+        half_width = NormalDist().inv_cdf(1 - alpha / 2) * np.sqrt(np.maximum(variances, 0) / totals)
+    ci = np.column_stack([means - half_width, means + half_width])
+
+    small = np.flatnonzero((totals > 0) & (totals < BOOTSTRAP_NORMAL_MIN_N))
+    if not len(small) or len(small) * n_boot * len(support) > BOOTSTRAP_CELL_BUDGET:
+        return ci
+
+    rng = np.random.default_rng(seed)
+    # Draw several groups at once, keeping each draw array to a few million cells.
+    chunk = max(1, int(4_000_000 // (n_boot * len(support))))
+    for start in range(0, len(small), chunk):
+        idx = small[start:start + chunk]
+        # Only the values these groups actually contain take part in the draw.
+        present = counts[idx].sum(axis=0) > 0
+        pvals = counts[idx][:, present] / totals[idx, None]
+        draws = rng.multinomial(totals[idx].astype(np.int64), pvals, size=(n_boot, len(idx)))
+        boot_means = draws @ support[present] / totals[idx]
+        ci[idx] = np.quantile(boot_means, [alpha / 2, 1 - alpha / 2], axis=0).T
+    return ci
+
+
+def aggregate(df: pd.DataFrame, by: str = "ad", n_boot: int = 500, alpha: float = 0.05,
+              seed: int = 0) -> pd.DataFrame:
+    """
+    Groups results by 'ad', 'persona' or 'tag' and returns one row per group with the
+    row count, the share of each reaction, the mean confidence, the mean
+    confidence-weighted score and its bootstrap confidence interval.
+    """
+    column = GROUP_COLUMNS[by]
+    df = add_scores(df)
+    if df.empty:
+        return pd.DataFrame()
+    if by == "tag":
+        # One row per (result, distinct tag); tags are normalized per distinct value, not per row.
+        lengths = df["tags"].map(len).to_numpy(dtype=np.int64)
+        raw_codes, raw_tags = pd.factorize(pd.Series(list(chain.from_iterable(df["tags"])), dtype=object).astype(str))
+        codes, groups = pd.factorize(pd.Index(raw_tags).str.strip().str.lower()[raw_codes])
+        if not len(groups):
+            return pd.DataFrame()
+        # A result tagged both "A" and " a" counts once towards "a".
+        pairs = np.unique(np.repeat(np.arange(len(df)), lengths) * len(groups) + codes)
+        df = df.iloc[pairs // len(groups)].reset_index(drop=True)
+        codes = pairs % len(groups)
+    else:
+        codes, groups = pd.factorize(df[column])
+
+    n_groups = len(groups)
+    counts = np.bincount(codes, minlength=n_groups)
+    summary = pd.DataFrame({column: groups, "count": counts})
+    reaction_codes = df["reaction"].map({r: i for i, r in enumerate(REACTION_SCORES)}).to_numpy(dtype=np.int64)
+    reaction_counts = np.bincount(codes * len(REACTION_SCORES) + reaction_codes,
+                                  minlength=n_groups * len(REACTION_SCORES)).reshape(n_groups, -1)
+    for i, reaction in enumerate(REACTION_SCORES):
+        summary[f"{reaction}_share"] = reaction_counts[:, i] / counts
+    confidence = df["confidence"].to_numpy(dtype=float)
+    has_confidence = ~np.isnan(confidence)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        summary["mean_confidence"] = (np.bincount(codes, weights=np.where(has_confidence, confidence, 0), minlength=n_groups)
+                                      / np.bincount(codes, weights=has_confidence, minlength=n_groups))
+    summary["score"] = np.bincount(codes, weights=df["score"].to_numpy(), minlength=n_groups) / counts
+    ci = bootstrap_mean_ci(codes, df["score"].to_numpy(), n_groups, n_boot=n_boot, alpha=alpha, seed=seed)
+    summary["score_ci_low"] = ci[:, 0]
+    summary["score_ci_high"] = ci[:, 1]
+    return summary.sort_values("count", ascending=False).reset_index(drop=True)
+
+
+def summarize(source, n_boot: int = 500) -> dict:
+    """Per-ad, per-persona and per-tag aggregates as JSON-ready records."""
+    df = load_results(source)
+    return {
+        "rows": len(df),
+        **{
+            by: json.loads(aggregate(df, by=by, n_boot=n_boot).to_json(orient="records"))
+            for by in GROUP_COLUMNS
+        },
+    }
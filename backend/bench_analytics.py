@@ -0,0 +1,41 @@
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+from backend import analytics
+
+# Times the grouped aggregates on a synthetic result set.
+# Usage: python -m backend.bench_analytics --rows 300000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark simulation analytics on synthetic results.")
+    parser.add_argument("--rows", type=int, default=300_000, help="Number of result rows.")
+    parser.add_argument("--ads", type=int, default=20, help="Number of distinct ads.")
+    parser.add_argument("--personas", type=int, default=5_000, help="Number of distinct personas.")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    reactions = np.array(list(analytics.REACTION_SCORES))
+    tag_pool = np.array(["eco", "fashion", "tech", "price", "family", "trust"])
+    index = np.arange(args.rows)
+    frame = pd.DataFrame({
+        "ad_id": pd.Series(index % args.ads).map("ad_{}".format),
+        "agent_name": pd.Series(rng.integers(0, args.personas, args.rows)).map("persona_{}".format),
+        "reaction": reactions[rng.integers(0, len(reactions), args.rows)],
+        "confidence": rng.integers(0, 101, args.rows),
+        "tags": [list(tag_pool[rng.integers(0, len(tag_pool), n)]) for n in rng.integers(0, 4, args.rows)],
+    })
+
+    start = time.perf_counter()
+    df = analytics.load_results(frame)
+    print(f"{'load':>8}: {len(df)} rows in {time.perf_counter() - start:.3f}s")
+    for by in analytics.GROUP_COLUMNS:
+        start = time.perf_counter()
+        summary = analytics.aggregate(df, by=by)
+        print(f"{by:>8}: {len(summary)} groups in {time.perf_counter() - start:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
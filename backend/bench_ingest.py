@@ -0,0 +1,87 @@
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+import itertools
+import resource
+
+# Benchmarks persona CSV ingestion: parses a generated file of --rows personas (with
+# some bad and duplicate rows mixed in) and reports throughput and peak memory, then
+# streams the first --provision rows into agent creation on the in-process fake backend
+# and reports how soon the first agent exists.
+# Usage: python -m backend.bench_ingest --rows 1000000 --provision 2000
+
+
+def write_csv(path: str, rows: int, bad_every: int):
+    """Writes `rows` personas; every `bad_every`-th row is missing its description or repeats a name."""
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        f.write("agent_name,personality_description\n")
+        for i in range(rows):
+            if bad_every and i % bad_every == bad_every - 1:
+                f.write(f"persona_{i},\n" if i % (2 * bad_every) < bad_every else f"persona_{i - 1},dup\n")
+            else:
+                f.write(f'persona_{i},"I am persona {i}, a {("thrifty", "curious", "skeptical")[i % 3]} '
+                        f'shopper who likes {("tech", "outdoors", "cooking", "travel")[i % 4]}."\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark streaming persona CSV ingestion.")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Personas in the generated CSV.")
+    parser.add_argument("--bad-every", type=int, default=1000, help="Make every Nth row bad (0 for none).")
+    parser.add_argument("--provision", type=int, default=2000, help="Rows to provision on the fake backend.")
+    args = parser.parse_args()
+
+    os.environ.update({"LLM_BACKEND": "fake", "FAKE_NUM_AGENTS": "0", "FAKE_LATENCY_MEDIAN": "0.001",
+                       "PROVISION_RATE_PER_SEC": "1000", "PROVISION_MAX_CONCURRENCY": "32"})
+    from backend.client import get_client
+    from backend.create_agents import provision_agents, register_tools
+    from backend.persona_csv import PersonaReader, open_persona_csv
+
+    path = os.path.join(tempfile.mkdtemp(), "personas.csv")
+    write_csv(path, args.rows, args.bad_every)
+    print(f"Generated {args.rows} rows ({os.path.getsize(path) / 1e6:.1f} MB).")
+
+    # 1. Parse and validate the whole file
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    with open_persona_csv(path) as f:
+        reader = PersonaReader(f)
+        valid = sum(1 for _ in reader)
+    elapsed = time.perf_counter() - start
+    # ru_maxrss is in KiB on Linux.
+    growth = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) * 1024
+    report = reader.report
+    print(f"Parsed {report.rows} rows in {elapsed:.2f}s ({report.rows / elapsed:,.0f} rows/s): {valid} valid, "
+          f"{report.bad_rows} bad {report.bad}; peak RSS grew {growth / 1e6:.1f} MB (the name set).")
+
+    # 2. Stream the first rows into agent creation
+    client = get_client()
+    tool_names = register_tools()
+    real_stdout = sys.stdout
+    first_agent = []
+
+    async def run():
+        start = time.perf_counter()
+        with open_persona_csv(path) as f:
+            task = asyncio.ensure_future(provision_agents(itertools.islice(PersonaReader(f), args.provision),
+                                                          tool_names))
+            while not task.done():
+                if not first_agent and client.agents.list(limit=1):
+                    first_agent.append(time.perf_counter() - start)
+                await asyncio.sleep(0.005)
+            return await task, time.perf_counter() - start
+
+    sys.stdout = open(os.devnull, "w")
+    try:
+        summary, elapsed = asyncio.run(run())
+    finally:
+        sys.stdout.close()
+        sys.stdout = real_stdout
+    print(f"Provisioned {summary['created']} agents in {elapsed:.2f}s; first agent after "
+          f"{first_agent[0] * 1000 if first_agent else float('nan'):.0f} ms.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+
+# Load-tests the simulation pipeline against the in-process fake backend
+# (LLM_BACKEND=fake), with no network access and no token spend.
+# Usage: python -m backend.bench_load --agents 10000 --max-in-flight 512
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test a simulation run against the in-process fake backend.")
+    parser.add_argument("--agents", type=int, default=10_000, help="Number of fake agents.")
+    parser.add_argument("--max-in-flight", type=int, default=512, help="Concurrent agent interactions.")
+    parser.add_argument("--latency-median", type=float, default=0.5, help="Median time to first chunk, in seconds.")
+    parser.add_argument("--latency-sigma", type=float, default=0.6, help="Log-normal spread of the latency.")
+    parser.add_argument("--chunk-delay", type=float, default=0.005, help="Delay between streamed chunks, in seconds.")
+    parser.add_argument("--error-rate", type=float, default=0.02, help="Fraction of calls failing with an API error.")
+    parser.add_argument("--stream-error-rate", type=float, default=0.01, help="Fraction of streams dropped midway.")
+    parser.add_argument("--degenerate-rate", type=float, default=0.05, help="Fraction of degenerate replies.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the scripted agent turns.")
+    args = parser.parse_args()
+
+    # The backend and simulation modules read their configuration at import time.
+    os.environ.update({
+        "LLM_BACKEND": "fake",
+        "FAKE_NUM_AGENTS": str(args.agents),
+        "FAKE_LATENCY_MEDIAN": str(args.latency_median),
+        "FAKE_LATENCY_SIGMA": str(args.latency_sigma),
+        "FAKE_CHUNK_DELAY": str(args.chunk_delay),
+        "FAKE_ERROR_RATE": str(args.error_rate),
+        "FAKE_STREAM_ERROR_RATE": str(args.stream_error_rate),
+        "FAKE_DEGENERATE_RATE": str(args.degenerate_rate),
+        "FAKE_SEED": str(args.seed),
+        "SIMULATION_MAX_IN_FLIGHT": str(args.max_in_flight),
+        "RESULT_LOG_ENABLED": "0",
+        "LOG_LEVEL": "ERROR",
+        "RESPONSE_CACHE_PATH": os.path.join(tempfile.mkdtemp(), "bench_cache.sqlite3"),
+    })
+    from backend import simulation
+    from backend.client import get_client
+    from backend.metrics import METRICS
+
+    client = get_client()
+    # Silence the per-agent prints so they don't skew the timings.
+    real_stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")
+    try:
+        start = time.perf_counter()
+        results = asyncio.run(simulation.run_simulation_with_ad_copy("Benchmark ad", use_cache=False))
+        elapsed = time.perf_counter() - start
+    finally:
+        sys.stdout.close()
+        sys.stdout = real_stdout
+
+    print(f"{len(results)}/{args.agents} reactions in {elapsed:.1f}s "
+          f"({args.agents / elapsed:.0f} agents/s, {client.stream_calls} stream calls)")
+    print("Scripted outcomes: " + ", ".join(f"{kind} {count}" for kind, count in sorted(client.outcomes.items())))
+    for label, histogram in (("queue wait", METRICS.queue_wait), ("first chunk", METRICS.first_chunk),
+                             ("first tool call", METRICS.first_tool_call), ("stream", METRICS.stream_time)):
+        print(f"{label:>16}: mean {histogram.sum / max(histogram.count, 1):.2f}s, "
+              f"p50 <= {histogram.quantile(0.5)}s, p95 <= {histogram.quantile(0.95)}s")
+    # Lower bound: every agent's latency, perfectly packed into max_in_flight slots.
+    print(f"Ideal at this concurrency: ~{args.agents * args.latency_median / args.max_in_flight:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+# Shows how each AGENT_MEMORY_MODE affects per-call context size over repeated
+# simulations, using the in-process fake backend (which counts the input tokens of
+# every stream call: memory blocks, message history and the new message).
+# Usage: python -m backend.bench_memory --agents 50 --ads 20
+
+MODES = ["persistent", "bounded", "stateless"]
+
+PROBE = """
+import asyncio, json, statistics
+from backend import simulation
+from backend.client import get_client
+client = get_client()
+per_ad = []
+for i in range({ads}):
+    start = len(client.input_tokens)
+    asyncio.run(simulation.run_simulation_with_ad_copy(f"Benchmark ad number {{i}}", use_cache=False, ad_id=f"ad_{{i}}"))
+    per_ad.append(statistics.mean(client.input_tokens[start:]))
+print(json.dumps(per_ad))
+"""
+
+
+def measure(mode: str, agents: int, ads: int) -> list:
+    """Mean input tokens per stream call for each of `ads` consecutive simulations in `mode`."""
+    env = dict(os.environ, LLM_BACKEND="fake", AGENT_MEMORY_MODE=mode, FAKE_NUM_AGENTS=str(agents),
+               FAKE_LATENCY_MEDIAN="0.001", FAKE_CHUNK_DELAY="0", FAKE_ERROR_RATE="0",
+               FAKE_STREAM_ERROR_RATE="0", FAKE_DEGENERATE_RATE="0", RESULT_LOG_ENABLED="0",
+               PYTHONPATH=os.path.join(os.path.dirname(__file__), '..'))
+    proc = subprocess.run([sys.executable, "-c", PROBE.format(ads=ads)], capture_output=True, text=True, env=env)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip())
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare agent context growth across memory modes.")
+    parser.add_argument("--agents", type=int, default=50, help="Number of fake agents.")
+    parser.add_argument("--ads", type=int, default=20, help="Consecutive simulations to run.")
+    args = parser.parse_args()
+
+    for mode in MODES:
+        per_ad = measure(mode, args.agents, args.ads)
+        # Bounded mode is a sawtooth (history resets every MEMORY_RESET_EVERY ads), so
+        # compare the mean and peak of the second half, not the last ad.
+        late = per_ad[len(per_ad) // 2:]
+        print(f"{mode:>10}: input tokens per call, first ad {per_ad[0]:6.0f}, "
+              f"later ads mean {sum(late) / len(late):6.0f}, peak {max(late):6.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+
+from backend.fake_letta import FakeLettaServer
+
+# Benchmarks run_simulation_with_ad_copy against a local fake Letta server.
+# Usage: python -m backend.bench_simulation --agents 20 --latency 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark simulation fan-out against a fake Letta server.")
+    parser.add_argument("--agents", type=int, default=20, help="Number of fake agents.")
+    parser.add_argument("--latency", type=float, default=1.0, help="Injected latency per stream call, in seconds.")
+    parser.add_argument("--max-in-flight", type=int, default=None, help="Concurrency limit for the concurrent run.")
+    args = parser.parse_args()
+
+    with FakeLettaServer(num_agents=args.agents, latency=args.latency) as server:
+        # The simulation module reads its configuration at import time.
+        os.environ["LETTA_API_KEY"] = "fake-key"
+        os.environ["LETTA_BASE_URL"] = server.base_url
+        os.environ["RESULT_LOG_ENABLED"] = "0"
+        os.environ["RESPONSE_CACHE_PATH"] = os.path.join(tempfile.mkdtemp(), "bench_cache.sqlite3")
+        from backend import simulation
+
+        # Silence the per-agent prints so they don't skew the timings.
+        real_stdout = sys.stdout
+        results = {}
+        runs = [("serial", 1, False), ("concurrent", args.max_in_flight, False), ("cached", args.max_in_flight, True)]
+        for label, limit, use_cache in runs:
+            sys.stdout = open(os.devnull, "w")
+            try:
+                start = time.perf_counter()
+                calls_before = server.stream_calls
+                collected = asyncio.run(simulation.run_simulation_with_ad_copy(
+                    "Benchmark ad", max_in_flight=limit, use_cache=use_cache))
+                elapsed = time.perf_counter() - start
+            finally:
+                sys.stdout.close()
+                sys.stdout = real_stdout
+            results[label] = elapsed
+            print(f"{label:>10}: {len(collected)}/{args.agents} results in {elapsed:.3f}s "
+                  f"({server.stream_calls - calls_before} stream calls)")
+
+    print(f"Slowest single agent: {args.latency:.2f}s, sum of all agents: {args.agents * args.latency:.2f}s")
+    print(f"Speedup: {results['serial'] / results['concurrent']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+# Measures cold import time of the backend entry points in fresh interpreters and
+# checks that the light ones stay light: no credentials needed and no heavy
+# third-party packages imported. Exits non-zero if a check fails.
+# Usage: python -m backend.bench_startup --runs 5
+
+HEAVY_MODULES = ["fastapi", "uvicorn", "letta_client", "httpx", "numpy", "pandas"]
+
+# (module, heavy modules it must not import, import-time budget in seconds)
+TARGETS = [
+    ("backend.main", HEAVY_MODULES, 0.3),
+    ("backend.create_agents", HEAVY_MODULES, 0.3),
+    ("backend.simulation", HEAVY_MODULES, 0.3),
+    ("backend.server", ["letta_client", "numpy", "pandas"], 2.0),
+]
+
+PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(module: str, heavy: list, runs: int) -> dict:
+    """Imports `module` in `runs` fresh interpreters without LETTA_API_KEY set."""
+    env = {k: v for k, v in os.environ.items() if k != "LETTA_API_KEY"}
+    env["PYTHONPATH"] = os.path.join(os.path.dirname(__file__), '..')
+    timings, loaded = [], set()
+    for _ in range(runs):
+        proc = subprocess.run([sys.executable, "-c", PROBE.format(module=module, heavy=heavy)],
+                              capture_output=True, text=True, env=env)
+        if proc.returncode != 0:
+            return {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed"}
+        probe = json.loads(proc.stdout.strip().splitlines()[-1])
+        timings.append(probe["seconds"])
+        loaded.update(probe["heavy"])
+    return {"seconds": statistics.median(timings), "heavy": sorted(loaded)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark and check backend import times.")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per module.")
+    args = parser.parse_args()
+
+    failed = False
+    for module, heavy, budget in TARGETS:
+        result = measure(module, heavy, args.runs)
+        if "error" in result:
+            print(f"{module:>22}: FAILED to import without credentials ({result['error']})")
+            failed = True
+            continue
+        problems = []
+        if result["seconds"] > budget:
+            problems.append(f"over {budget:.1f}s budget")
+        if result["heavy"]:
+            problems.append(f"imports {', '.join(result['heavy'])}")
+        failed = failed or bool(problems)
+        print(f"{module:>22}: {result['seconds'] * 1000:7.1f} ms  {'; '.join(problems) or 'ok'}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import os
+import threading
+from dotenv import load_dotenv
+
+# The shared LLM backend client. It is created on first use rather than at import time,
+# so modules can be imported (by tooling, benchmarks or the CLI) without credentials and
+# without paying for the letta_client/httpx imports. Every caller shares one
+# connection pool, so keep-alive connections are reused across agents and requests.
+#
+# LLM_BACKEND picks the implementation:
+#   letta - the letta_client SDK (Letta Cloud, or LETTA_BASE_URL)
+#   fake  - fake_letta.FakeLettaClient, an in-process stand-in configured by the
+#           FAKE_* variables, for load tests without network access or token spend
+# Any backend must provide the client calls the simulation and provisioning code use:
+# agents.list/create/delete/modify, agents.messages.create_stream/reset,
+# agents.blocks.retrieve/modify and tools.list/upsert, with streams yielding chunks
+# that carry message_type, content and tool_call.
+
+# Load environment variables from .env file
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '..', '.env'))
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "letta")
+# Should cover SIMULATION_MAX_IN_FLIGHT concurrent streams plus provisioning calls.
+LETTA_MAX_CONNECTIONS = int(os.getenv("LETTA_MAX_CONNECTIONS", "64"))
+LETTA_MAX_KEEPALIVE = int(os.getenv("LETTA_MAX_KEEPALIVE", "64"))
+LETTA_KEEPALIVE_EXPIRY = float(os.getenv("LETTA_KEEPALIVE_EXPIRY", "30"))
+LETTA_TIMEOUT = float(os.getenv("LETTA_TIMEOUT", "60"))
+
+_CLIENT = None
+_CLIENT_LOCK = threading.Lock()
+
+
+def get_client():
+    """
+    Returns the process-wide backend client, creating it on first use.
+    Raises ValueError if LETTA_API_KEY is not set for the Letta backend.
+    """
+    global _CLIENT
+    if _CLIENT is not None:
+        return _CLIENT
+    with _CLIENT_LOCK:
+        if _CLIENT is None:
+            if LLM_BACKEND == "letta":
+                _CLIENT = _create_letta_client()
+            elif LLM_BACKEND == "fake":
+                from backend.fake_letta import FakeLettaClient
+                _CLIENT = FakeLettaClient.from_env()
+            else:
+                raise ValueError(f"Unknown LLM_BACKEND '{LLM_BACKEND}' (expected 'letta' or 'fake').")
+    return _CLIENT
+
+
+def _create_letta_client():
+    """Builds the letta_client SDK client on a pooled keep-alive HTTP client."""
+    api_key = os.getenv("LETTA_API_KEY")
+    if not api_key:
+        raise ValueError("LETTA_API_KEY not found in .env file.")
+    import httpx
+    from letta_client import Letta
+
+    http = httpx.Client(
+        limits=httpx.Limits(max_connections=LETTA_MAX_CONNECTIONS,
+                            max_keepalive_connections=LETTA_MAX_KEEPALIVE,
+                            keepalive_expiry=LETTA_KEEPALIVE_EXPIRY),
+        timeout=LETTA_TIMEOUT,
+    )
+    # LETTA_BASE_URL lets us point the client at a self-hosted or fake server (see fake_letta.py).
+    base_url = os.getenv("LETTA_BASE_URL")
+    kwargs = {"base_url": base_url} if base_url else {}
+    return Letta(token=api_key, httpx_client=http, **kwargs)
@@ -1,28 +1,46 @@
 import os
 import sys
-import csv
+import json
+import time
+import hashlib
 import inspect
 import asyncio
-from letta_client import Letta
+from concurrent.futures import ThreadPoolExecutor
 from backend import tools_v2
+from backend.agent_registry import AGENT_REGISTRY
+from backend.agent_memory import AGENT_MEMORY_MODE, HISTORY_LABEL, INTERACTION_HISTORY_LIMIT
+from backend.client import get_client
+from backend.persona_csv import PersonaReader, PersonaSchemaError, open_persona_csv
+from backend.prompts import render_persona, template_tag
+from backend.rate_limit import AdaptiveTokenBucket, call_with_retry, get_status_code
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '..', '.env'))
 
 # --- Configuration ---
-# Use Letta Cloud
-api_key = os.getenv("LETTA_API_KEY")
-if not api_key:
-    raise ValueError("LETTA_API_KEY not found in .env file. Please create a .env file in the 'digital-clone' directory.")
-CLIENT = Letta(token=api_key)
+# The Letta client (Letta Cloud unless LETTA_BASE_URL is set) is created lazily by get_client().
 
 PERSONALITIES_CSV = os.path.join(os.path.dirname(__file__), '..', 'data', 'agent_personalities.csv')
+# Bulk provisioning limits. Rates are ceilings: they are lowered only when the server
+# answers 429, so throughput tracks the API's real rate limit. Calls run on worker threads because the client is synchronous.
+PROVISION_MAX_CONCURRENCY = int(os.getenv("PROVISION_MAX_CONCURRENCY", "8"))
+PROVISION_RATE_PER_SEC = float(os.getenv("PROVISION_RATE_PER_SEC", "5"))
+PROVISION_MAX_RETRIES = int(os.getenv("PROVISION_MAX_RETRIES", "5"))
+DELETE_MAX_CONCURRENCY = int(os.getenv("DELETE_MAX_CONCURRENCY", "16"))
+DELETE_MAX_RATE_PER_SEC = float(os.getenv("DELETE_MAX_RATE_PER_SEC", "50"))
+PROVISION_PROGRESS_EVERY = int(os.getenv("PROVISION_PROGRESS_EVERY", "100"))
+EXECUTOR = ThreadPoolExecutor(max_workers=max(PROVISION_MAX_CONCURRENCY, DELETE_MAX_CONCURRENCY),
+                              thread_name_prefix="provision")
+
 AGENT_CONFIG = {
     "model": "openai/gpt-4o-mini",
     "embedding": "openai/text-embedding-3-small"
 }
 
+# Registered tools carry a "source-hash:<fingerprint>" tag (see register_tools).
+TOOL_FINGERPRINT_TAG_PREFIX = "source-hash:"
+
 # Manually define tool schemas to handle extra server-side args
 CUSTOM_TOOL_SCHEMAS = [
     {
@@ -89,8 +107,15 @@ CUSTOM_TOOL_SCHEMAS = [
     },
     {
         "name": "read_shared_knowledge",
-        "description": "Reads the shared knowledge base accessible to all agents.",
-        "parameters": {"type": "object", "properties": {}}
+        "description": "Reads the shared knowledge base accessible to all agents. Pass a `query` (e.g. the ad text) to get the most relevant entries; otherwise returns the latest entries, or only those added after `offset`.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "query": {"type": "string", "description": "Text to find relevant entries for, such as the ad content."},
+                "offset": {"type": "integer", "description": "Only return entries with an id greater than this (the next_offset from a previous read). 0 returns the latest entries."},
+                "limit": {"type": "integer", "description": "The maximum number of entries to return (at most 100; default 5 with a query, else 20)."}
+            }
+        }
     },
     {
         "name": "write_shared_knowledge",
@@ -106,40 +131,76 @@ CUSTOM_TOOL_SCHEMAS = [
 ]
 
 
-async def delete_all_agents():
-    """Deletes all agents from the Letta server."""
+async def delete_all_agents(max_concurrency: int = DELETE_MAX_CONCURRENCY,
+                            max_rate: float = DELETE_MAX_RATE_PER_SEC):
+    """
+    Deletes all agents from the Letta server.
+    Deletes run concurrently (bounded by `max_concurrency`) at up to `max_rate` calls/s;
+    the rate is only lowered when the server throttles us. Returns a summary dict.
+    """
     print("Deleting all existing agents...")
+    summary = {"deleted": 0, "failed": 0, "failed_agents": []}
     try:
-        agents = CLIENT.agents.list()
-        if not agents:
-            print("  - No agents found to delete.")
-            return
-        
-        print(f"  - Found {len(agents)} agents to delete.")
-        
-        # Delete agents one by one to avoid overwhelming the API
-        deleted_count = 0
-        for agent in agents:
-            try:
-                CLIENT.agents.delete(agent.id)
-                deleted_count += 1
-                print(f"  - Deleted agent {agent.name} ({deleted_count}/{len(agents)})")
-                # Small delay to avoid rate limiting
-                await asyncio.sleep(0.5)
-            except Exception as e:
-                print(f"  - Warning: Failed to delete agent {agent.name}: {e}")
-                # Continue with other agents even if one fails
-                continue
-        
-        print(f"  - Successfully deleted {deleted_count} out of {len(agents)} agents.")
+        loop = asyncio.get_running_loop()
+        agents = await loop.run_in_executor(EXECUTOR, lambda: AGENT_REGISTRY.agents(refresh=True))
     except Exception as e:
-        print(f"An error occurred while listing/deleting agents: {e}")
+        print(f"An error occurred while listing agents: {e}")
         # We re-raise the exception to be handled by the API endpoint
         raise e
 
+    if not agents:
+        print("  - No agents found to delete.")
+        return summary
+
+    print(f"  - Found {len(agents)} agents to delete.")
+    bucket = AdaptiveTokenBucket(max_rate)
+    semaphore = asyncio.Semaphore(max_concurrency)
+    start = time.perf_counter()
+
+    def on_retry(e, delay):
+        if get_status_code(e) == 429:
+            bucket.on_throttle()
+
+    async def delete_one(agent):
+        async with semaphore:
+            await bucket.acquire()
+            try:
+                await call_with_retry(
+                    get_client().agents.delete, agent.id,
+                    executor=EXECUTOR, retries=PROVISION_MAX_RETRIES, on_retry=on_retry,
+                )
+                bucket.on_success()
+                AGENT_REGISTRY.remove(agent.id)
+                summary["deleted"] += 1
+                print(f"  - Deleted agent {agent.name} ({summary['deleted']}/{len(agents)})")
+            except Exception as e:
+                # Continue with other agents even if one fails
+                summary["failed"] += 1
+                summary["failed_agents"].append(agent.name)
+                print(f"  - Warning: Failed to delete agent {agent.name}: {e}")
+
+    await asyncio.gather(*(delete_one(agent) for agent in agents))
+
+    elapsed = time.perf_counter() - start
+    print(f"  - Successfully deleted {summary['deleted']} out of {len(agents)} agents in {elapsed:.1f}s "
+          f"({bucket.throttle_count} throttled calls, final rate {bucket.rate:.1f}/s).")
+    if summary["failed_agents"]:
+        print(f"  - Failed to delete: {', '.join(summary['failed_agents'])}")
+    return summary
+
+def tool_fingerprint(schema: dict, source_code: str) -> str:
+    """Hashes a tool's schema and source; changes whenever either does."""
+    payload = json.dumps(schema, sort_keys=True) + "\0" + source_code
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
 def register_tools():
-    """Registers all custom tools with the Letta server using manual schemas and source code."""
-    print("Registering fresh tools...")
+    """
+    Registers all custom tools with the Letta server using manual schemas and source code.
+    Each tool is tagged with a fingerprint of its schema and source; the server's tools
+    are listed once and only tools that are missing or whose fingerprint changed are
+    upserted, so repeated runs usually make a single list call.
+    """
+    print("Registering tools...")
     
     # Read the entire source code of the tools_v2 module
     try:
@@ -148,110 +209,207 @@ def register_tools():
         with open(tools_v2.__file__, 'r') as f:
             tools_source_code = f.read()
 
-    tool_names = []
+    # 1. Look up the server's copies of our tools in one call
+    tool_names = [schema["name"] for schema in CUSTOM_TOOL_SCHEMAS]
+    try:
+        existing = {tool.name: tool for tool in get_client().tools.list(names=tool_names, limit=len(tool_names))}
+    except Exception as e:
+        print(f"  - Could not list existing tools ({e}); registering all of them.")
+        existing = {}
+
+    # 2. Upsert only the tools whose fingerprint is missing or stale
+    stale = []
     for schema in CUSTOM_TOOL_SCHEMAS:
+        tag = TOOL_FINGERPRINT_TAG_PREFIX + tool_fingerprint(schema, tools_source_code)
+        tool = existing.get(schema["name"])
+        if tool is None or tag not in (tool.tags or []):
+            stale.append((schema, tag))
+
+    def upsert(item):
+        schema, tag = item
+        return get_client().tools.upsert(json_schema=schema, source_code=tools_source_code, tags=[tag])
+
+    # The API has no bulk upsert, so changed tools are uploaded in parallel instead. They get
+    # their own short-lived pool: callers run this function on EXECUTOR, and waiting there on
+    # work queued to EXECUTOR could deadlock a small or busy pool.
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, len(stale)), thread_name_prefix="tool-upload") as uploads:
+            for tool in uploads.map(upsert, stale):
+                print(f"  - Registered tool '{tool.name}'")
+    except Exception as e:
+        print(f"Error registering tools: {e}")
+        sys.exit(1)
+    print(f"  - {len(stale)} tools uploaded, {len(tool_names) - len(stale)} unchanged.")
+    return tool_names
+
+def build_persona(agent_name: str, personality_text: str) -> str:
+    """Builds the persona memory block for an agent."""
+    # The persona memory block holds the core, read-only identity plus the static
+    # task instructions of the current prompt template (see prompts.py).
+    return render_persona(agent_name, personality_text)
+
+def _create_agent(agent_name: str, personality_text: str, tool_names: list):
+    """Creates an agent on the server. Raises on failure so callers can retry."""
+    history_block = {
+        "label": HISTORY_LABEL,
+        "value": "This memory block stores your past ad interactions. You can read and write to it.",
+        "description": "A read-write memory of past interactions with ads.",
+    }
+    # Only bounded mode caps the block; otherwise it keeps the server's default limit.
+    if AGENT_MEMORY_MODE == "bounded":
+        history_block["limit"] = INTERACTION_HISTORY_LIMIT
+    return get_client().agents.create(
+        name=agent_name,
+        memory_blocks=[
+            {
+                "label": "persona",
+                "value": build_persona(agent_name, personality_text),
+            },
+            history_block,
+        ],
+        tools=tool_names + ["core_memory_append", "core_memory_replace"],
+        tags=[template_tag()],
+        # Only in the opt-in stateless mode does the server drop each turn's messages itself;
+        # persistent (the default) and bounded agents keep them (see agent_memory.py).
+        message_buffer_autoclear=AGENT_MEMORY_MODE == "stateless",
+        model=AGENT_CONFIG["model"],
+        embedding=AGENT_CONFIG["embedding"]
+    )
+
+def _create_or_find_agent(agent_name: str, personality_text: str, tool_names: list, errors: list):
+    """
+    Creates an agent, as a retry-safe step. `errors` holds the failures of earlier
+    attempts: a 5xx or dropped connection may have come after the server created the
+    agent, so in that case an existing agent with the name is returned instead of
+    creating a duplicate. After a 429 nothing was created, so it just tries again.
+    """
+    if errors and get_status_code(errors[-1]) != 429:
+        existing = get_client().agents.list(name=agent_name)
+        if existing:
+            print(f"  - Agent '{agent_name}' was created by an earlier attempt.")
+            return existing[0]
+    return _create_agent(agent_name, personality_text, tool_names)
+
+async def provision_agents(personas, tool_names: list,
+                           max_concurrency: int = PROVISION_MAX_CONCURRENCY,
+                           rate_per_sec: float = PROVISION_RATE_PER_SEC, existing_names: set = None):
+    """
+    Creates an agent for each (agent_name, personality_description) pair concurrently.
+    `personas` may be any iterable of unique names, e.g. a PersonaReader streaming a CSV:
+    rows are pulled only as workers free up, so creation starts immediately and memory
+    stays flat. Existing agent names are fetched once up front and checked with a set lookup,
+    unless the caller passes `existing_names` (e.g. an empty set when it already excluded them).
+    Creation is bounded by `max_concurrency`, paced by an adaptive token bucket that
+    slows down on 429s, and retried with backoff on 429/5xx (checking
+    first whether a failed attempt created the agent anyway). Returns a summary dict of created/skipped/failed counts.
+    """
+    summary = {"created": 0, "skipped": 0, "failed": 0}
+
+    # 1. One up-front listing of existing agent names (which also loads the agent registry)
+    if existing_names is None:
+        loop = asyncio.get_running_loop()
+        existing = await loop.run_in_executor(EXECUTOR, lambda: AGENT_REGISTRY.agents(refresh=True))
+        existing_names = {agent.name for agent in existing}
+        del existing
+        print(f"Found {len(existing_names)} existing agents on the server.")
+
+    # 2. Create agents as rows arrive, behind the rate limiter
+    print(f"Creating agents (concurrency={max_concurrency}, rate={rate_per_sec}/s)...")
+    bucket = AdaptiveTokenBucket(rate_per_sec)
+    start = time.perf_counter()
+
+    def report_retry(agent_name, errors):
+        def on_retry(e, delay):
+            errors.append(e)
+            if get_status_code(e) == 429:
+                bucket.on_throttle()
+            print(f"  - Retrying '{agent_name}' in {delay:.1f}s after error: {e}")
+        return on_retry
+
+    async def create_one(agent_name, personality_desc):
+        await bucket.acquire()
         try:
-            tool = CLIENT.tools.create(
-                json_schema=schema,
-                source_code=tools_source_code
+            errors = []
+            agent = await call_with_retry(
+                _create_or_find_agent, agent_name, personality_desc, tool_names, errors,
+                executor=EXECUTOR, retries=PROVISION_MAX_RETRIES, on_retry=report_retry(agent_name, errors),
             )
-            tool_names.append(tool.name)
-            print(f"  - Registered tool '{tool.name}'")
+            bucket.on_success()
+            AGENT_REGISTRY.add(agent)
+            summary["created"] += 1
+            print(f"  - Successfully created agent '{agent.name}' with ID: {agent.id}")
         except Exception as e:
-            if "already exists" in str(e):
-                tool_names.append(schema['name'])
-                print(f"  - Tool '{schema['name']}' already exists.")
-            else:
-                print(f"Error registering tool '{schema['name']}': {e}")
-                sys.exit(1)
-    return tool_names
+            summary["failed"] += 1
+            print(f"  - Error creating agent '{agent_name}': {e}")
+
+        done = summary["created"] + summary["failed"]
+        if done % PROVISION_PROGRESS_EVERY == 0:
+            elapsed = time.perf_counter() - start
+            print(f"  - Progress: {done} agents processed ({done / elapsed:.1f} agents/s)")
+
+    rows = iter(personas)
+
+    async def worker():
+        # Workers share one iterator; next() runs on the event loop thread, so each row
+        # is handed to exactly one worker.
+        for agent_name, personality_desc in rows:
+            if agent_name in existing_names:
+                print(f"  - Agent with name '{agent_name}' already exists. Skipping.")
+                summary["skipped"] += 1
+                continue
+            await create_one(agent_name, personality_desc)
 
-def create_agent_from_row(agent_name: str, personality_text: str, tool_names: list):
-    """Creates a single agent from a personality text."""
-    # The persona memory block holds the core, read-only identity.
-    persona_content = f"""
-You are a person with the following personality: {personality_text}.
-Your name is {agent_name}.
-You are interacting with a social media feed. When you see an ad, you MUST use one or more of the provided tools to react.
-You can use agent_like_ad, agent_dislike_ad, agent_comment_ad, agent_repost_ad, or agent_ignore_ad.
-After using the tools, output a short, final message expressing your overall opinion.
-    """
+    # If one worker fails (e.g. the CSV can't be read), stop the others rather than let
+    # them keep creating agents for a job that has already failed.
+    workers = [asyncio.ensure_future(worker()) for _ in range(max_concurrency)]
+    try:
+        await asyncio.gather(*workers)
+    except BaseException:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        raise
+
+    elapsed = time.perf_counter() - start
+    if not summary["created"] and not summary["failed"]:
+        print("No new agents to create.")
+    print(f"Provisioned {summary['created']} agents in {elapsed:.1f}s "
+          f"({summary['created'] / elapsed if elapsed else 0:.1f} agents/s); "
+          f"{summary['skipped']} skipped, {summary['failed']} failed.")
+    return summary
+
+
+async def _provision_from_csv(csv_file_like_object, recreate: bool) -> int:
+    """Validates the CSV header, prepares the server, then streams the rows into provision_agents."""
+    # 1. Check the header before touching the server
+    personas = PersonaReader(csv_file_like_object)
+
+    # 2. Delete all old agents first, if recreating
+    if recreate:
+        await delete_all_agents()
+
+    # 3. Register all tools, off the event loop (its uploads fan out on the same pool)
+    tool_names = await asyncio.get_running_loop().run_in_executor(EXECUTOR, register_tools)
+    if not tool_names:
+        print("No tools were registered. Halting agent creation.")
+        raise Exception("Tool registration failed.")
 
-    print(f"Creating agent '{agent_name}'...")
+    # 4. Create an agent for each personality as the rows are read
     try:
-        # To avoid conflicts, let's first check if an agent with this name already exists
-        existing_agents = CLIENT.agents.list(name=agent_name)
-        if existing_agents:
-            print(f"  - Agent with name '{agent_name}' already exists. Skipping.")
-            return None
-
-        agent = CLIENT.agents.create(
-            name=agent_name,
-            memory_blocks=[
-                {
-                    "label": "persona",
-                    "value": persona_content,
-                },
-                {
-                    "label": "interaction_history",
-                    "value": "This memory block stores your past ad interactions. You can read and write to it.",
-                    "description": "A read-write memory of past interactions with ads."
-                }
-            ],
-            tools=tool_names + ["core_memory_append", "core_memory_replace"],
-            model=AGENT_CONFIG["model"],
-            embedding=AGENT_CONFIG["embedding"]
-        )
-        print(f"  - Successfully created agent '{agent.name}' with ID: {agent.id}")
-        return agent
-    except Exception as e:
-        print(f"  - Error creating agent '{agent_name}': {e}")
-        return None
+        summary = await provision_agents(personas, tool_names)
+    finally:
+        personas.report.print_report()
+    return summary["created"]
 
 
 async def recreate_agents_from_csv(csv_file_like_object):
     """
     Deletes all existing agents and creates new ones from a CSV file stream.
+    Raises PersonaSchemaError (before deleting anything) if the CSV header is invalid.
+    This discards every agent's memory; reconcile.py applies only what changed.
     """
     print("--- Starting Agent Recreation from CSV ---")
-    
-    # 1. Delete all old agents first
-    await delete_all_agents()
-
-    # 2. Register all tools (this can remain synchronous)
-    tool_names = register_tools()
-    if not tool_names:
-        print("No tools were registered. Halting agent creation.")
-        raise Exception("Tool registration failed.")
-
-    # 3. Read the personalities from the in-memory CSV
-    try:
-        reader = csv.DictReader(csv_file_like_object)
-        personalities = list(reader)
-    except Exception as e:
-        print(f"Error reading or parsing CSV file stream: {e}")
-        raise e
-    
-    if not personalities:
-        print("No personalities found in the provided CSV.")
-        return 0
-
-    print(f"Found {len(personalities)} personalities. Creating agents...")
-
-    # 4. Create an agent for each personality
-    created_count = 0
-    for person in personalities:
-        agent_name = person.get("name")
-        personality_desc = person.get("personality_description")
-        if not agent_name or not personality_desc:
-            print(f"Skipping row due to missing 'name' or 'personality_description': {person}")
-            continue
-        
-        # The creation logic itself is synchronous, but we call it
-        agent = create_agent_from_row(agent_name, personality_desc, tool_names)
-        if agent:
-            created_count += 1
-
+    created_count = await _provision_from_csv(csv_file_like_object, recreate=True)
     print("--- Agent Recreation Complete ---")
     return created_count
 
@@ -259,43 +417,10 @@ async def recreate_agents_from_csv(csv_file_like_object):
 async def create_agents_from_csv(csv_file_like_object):
     """
     Creates new agents from a CSV file stream without deleting existing ones.
+    Raises PersonaSchemaError if the CSV header is invalid.
     """
     print("--- Starting Agent Creation from CSV ---")
-
-    # 1. Register all tools (this can remain synchronous)
-    tool_names = register_tools()
-    if not tool_names:
-        print("No tools were registered. Halting agent creation.")
-        raise Exception("Tool registration failed.")
-
-    # 2. Read the personalities from the in-memory CSV
-    try:
-        reader = csv.DictReader(csv_file_like_object)
-        personalities = list(reader)
-    except Exception as e:
-        print(f"Error reading or parsing CSV file stream: {e}")
-        raise e
-    
-    if not personalities:
-        print("No personalities found in the provided CSV.")
-        return 0
-
-    print(f"Found {len(personalities)} personalities. Creating agents...")
-
-    # 3. Create an agent for each personality
-    created_count = 0
-    for person in personalities:
-        agent_name = person.get("name")
-        personality_desc = person.get("personality_description")
-        if not agent_name or not personality_desc:
-            print(f"Skipping row due to missing 'name' or 'personality_description': {person}")
-            continue
-        
-        # The creation logic itself is synchronous, but we call it
-        agent = create_agent_from_row(agent_name, personality_desc, tool_names)
-        if agent:
-            created_count += 1
-
+    created_count = await _provision_from_csv(csv_file_like_object, recreate=False)
     print("--- Agent Creation Complete ---")
     return created_count
 
@@ -303,42 +428,21 @@ async def create_agents_from_csv(csv_file_like_object):
 def main():
     """Main function to register tools and create agents from a CSV file."""
     print("--- Starting Agent Population from CSV ---")
-    
-    # 1. Register all tools
-    tool_names = register_tools()
-    if not tool_names:
-        print("No tools were registered. Exiting.")
-        return
 
-    # 2. Find and read the personalities CSV
+    # 1. Find the personalities CSV
     if not os.path.exists(PERSONALITIES_CSV):
         print(f"Error: Personalities CSV not found at '{PERSONALITIES_CSV}'")
         return
-        
+
+    # 2. Stream it into agent creation
     try:
-        with open(PERSONALITIES_CSV, mode='r', encoding='utf-8') as infile:
-            reader = csv.DictReader(infile)
-            personalities = list(reader)
-    except Exception as e:
-        print(f"Error reading or parsing CSV file: {e}")
+        with open_persona_csv(PERSONALITIES_CSV) as infile:
+            asyncio.run(_provision_from_csv(infile, recreate=False))
+    except PersonaSchemaError as e:
+        print(f"Error reading CSV file: {e}")
         return
-    
-    if not personalities:
-        print(f"No personalities found in '{PERSONALITIES_CSV}'.")
-        return
-
-    print(f"Found {len(personalities)} personalities. Creating agents...")
-
-    # 3. Create an agent for each personality in the CSV
-    for person in personalities:
-        agent_name = person.get("name")
-        personality_desc = person.get("personality_description")
-        if not agent_name or not personality_desc:
-            print(f"Skipping row due to missing 'name' or 'personality_description': {person}")
-            continue
-        create_agent_from_row(agent_name, personality_desc, tool_names)
 
     print("--- Agent Population Complete ---")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
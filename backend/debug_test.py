@@ -1,13 +1,8 @@
-import os
-from letta_client import Letta, MessageCreate
-from dotenv import load_dotenv
+from letta_client import MessageCreate
+from backend.client import get_client
 
-# Load environment variables
-load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '..', '.env'))
-
-# Initialize client
-api_key = os.getenv("LETTA_API_KEY")
-client = Letta(token=api_key)
+# Uses whichever backend LLM_BACKEND selects (see client.py)
+client = get_client()
 
 def test_simple_interaction():
     """Test a simple interaction with one agent to debug tool calling."""
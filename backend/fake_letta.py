@@ -0,0 +1,611 @@
+import os
+import re
+import json
+import math
+import time
+import zlib
+import random
+import uuid
+import itertools
+import threading
+from types import SimpleNamespace
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+# Stand-ins for the Letta backend, for load tests and benchmarks that must not touch the
+# network or spend tokens:
+# - FakeLettaServer speaks just enough of the /v1 REST protocol for the letta_client SDK
+#   to list, create and delete agents, register tools and stream messages.
+# - FakeLettaClient implements the same client surface in-process (see client.py), so
+#   10k-agent runs need no sockets at all.
+# Both script agent turns with FakeBehavior: realistic streamed tool_call_message /
+# assistant_message chunks, log-normal latencies, injected API and stream errors, and
+# degenerate outputs. Turns are seeded by agent and turn number, so runs are repeatable.
+
+REACTION_TOOLS = {
+    "like": "agent_like_ad",
+    "dislike": "agent_dislike_ad",
+    "comment": "agent_comment_ad",
+    "repost": "agent_repost_ad",
+    "ignore": "agent_ignore_ad",
+}
+DEGENERATE_KINDS = ["loop", "no_json", "malformed", "prose", "truncated", "empty"]
+FAKE_PERSONAS = [
+    "a young, tech-savvy student who loves new gadgets and environmental causes",
+    "an older skeptic wary of corporate greenwashing who wants data and proof",
+    "a busy parent of three who cares about saving time, money and family safety",
+    "a fashion lover who follows trends and influencers",
+    "a retired veteran who values tradition and durable products",
+    "a budget-conscious shopper hunting for discounts",
+]
+_AD_ID_RE = re.compile(r'^Ad (\S+): "')
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _message_text(messages) -> str:
+    """Text of the first message, whether given as a MessageCreate or a plain dict."""
+    if not messages:
+        return ""
+    message = messages[0]
+    content = message.get("content") if isinstance(message, dict) else getattr(message, "content", "")
+    return content if isinstance(content, str) else json.dumps(content, default=str)
+
+
+class FakeBehavior:
+    """
+    Decides what a fake agent does on each turn.
+    Time to first chunk is log-normal with the given median and sigma (sigma 0 makes it
+    fixed); later chunks arrive `chunk_delay` apart. `error_rate` of calls fail with an
+    API error (429/500/503), `stream_error_rate` drop the connection mid-stream, and
+    `degenerate_rate` produce one of DEGENERATE_KINDS instead of a clean reaction.
+    """
+
+    def __init__(self, latency_median: float = 0.5, latency_sigma: float = 0.5, chunk_delay: float = 0.0,
+                 error_rate: float = 0.0, stream_error_rate: float = 0.0, degenerate_rate: float = 0.0,
+                 seed: int = 0):
+        self.latency_median = latency_median
+        self.latency_sigma = latency_sigma
+        self.chunk_delay = chunk_delay
+        self.error_rate = error_rate
+        self.stream_error_rate = stream_error_rate
+        self.degenerate_rate = degenerate_rate
+        self.seed = seed
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            latency_median=float(os.getenv("FAKE_LATENCY_MEDIAN", "0.5")),
+            latency_sigma=float(os.getenv("FAKE_LATENCY_SIGMA", "0.5")),
+            chunk_delay=float(os.getenv("FAKE_CHUNK_DELAY", "0.0")),
+            error_rate=float(os.getenv("FAKE_ERROR_RATE", "0.0")),
+            stream_error_rate=float(os.getenv("FAKE_STREAM_ERROR_RATE", "0.0")),
+            degenerate_rate=float(os.getenv("FAKE_DEGENERATE_RATE", "0.0")),
+            seed=int(os.getenv("FAKE_SEED", "0")),
+        )
+
+    def plan_turn(self, agent: dict, text: str, turn: int) -> dict:
+        """
+        Scripts one turn of `agent` answering `text`. Returns {"status": HTTP error
+        status or None, "first_delay", "chunk_delay", "chunks": [chunk dicts],
+        "break_after": chunk index to drop the stream at, or None, "kind"}.
+        """
+        rng = random.Random(f"{self.seed}:{agent['id']}:{turn}")
+        plan = {"status": None, "chunks": [], "break_after": None, "kind": "clean",
+                "chunk_delay": self.chunk_delay, "first_delay": 0.0}
+        if self.latency_median > 0:
+            plan["first_delay"] = self.latency_median * math.exp(self.latency_sigma * rng.gauss(0, 1))
+        if rng.random() < self.error_rate:
+            plan["status"] = rng.choice([429, 500, 503])
+            plan["kind"] = "error"
+            return plan
+
+        reaction = self._reaction(agent, text, rng)
+        follow_up = "JSON analysis now" in text
+        ad_match = _AD_ID_RE.match(text)
+        ad_id = ad_match.group(1) if ad_match else "user_provided_ad"
+        chunks = [] if follow_up else self._tool_calls(agent, ad_id, reaction, rng)
+        reply = json.dumps(reaction)
+
+        if rng.random() < self.degenerate_rate:
+            plan["kind"] = rng.choice(DEGENERATE_KINDS)
+        kind = plan["kind"]
+        if kind == "loop":
+            reply = "I love this" + "!" * 20000
+        elif kind == "no_json":
+            reply = reaction["final_message"]
+        elif kind == "malformed":
+            reply = reply[:-1] + ",}"
+        elif kind == "prose":
+            reply = f"Here is my analysis: {reply} Hope that helps!"
+        elif kind == "truncated":
+            reply = reply[:len(reply) // 2]
+        elif kind == "empty":
+            chunks, reply = [], ""
+
+        if reply:
+            chunks.append({"message_type": "reasoning_message", "reasoning": "Deciding how I feel about this ad."})
+            # Stream the reply in small pieces, the way tokens arrive from a model.
+            chunks.extend({"message_type": "assistant_message", "content": reply[i:i + 16]}
+                          for i in range(0, len(reply), 16))
+        for chunk in chunks:
+            chunk.update(id=f"message-{uuid.UUID(int=rng.getrandbits(128))}", date=_now())
+        plan["chunks"] = chunks
+        if chunks and rng.random() < self.stream_error_rate:
+            plan["break_after"] = rng.randrange(len(chunks))
+            plan["kind"] = "stream_error"
+        return plan
+
+    def _reaction(self, agent: dict, text: str, rng: random.Random) -> dict:
+        # Each (persona, ad) pair gets its own fixed reaction odds.
+        odds = random.Random(zlib.crc32(f"{agent.get('persona', agent['name'])}|{text}".encode()))
+        weights = [odds.random() ** 2 for _ in REACTION_TOOLS]
+        reaction = rng.choices(list(REACTION_TOOLS), weights=weights)[0]
+        return {
+            "reaction": reaction,
+            "confidence": rng.randint(40, 95),
+            "reasoning": f"As {agent['name']}, this ad is a {reaction} for me.",
+            "tags": rng.sample(["eco", "price", "style", "tech", "family", "trust"], 2),
+            "final_message": {"comment": "Where is it made?", "repost": "Friends should see this."}.get(
+                reaction, "Looks good!" if reaction == "like" else "Not for me."),
+        }
+
+    def _tool_calls(self, agent: dict, ad_id: str, reaction: dict, rng: random.Random) -> list:
+        calls = [REACTION_TOOLS[reaction["reaction"]]]
+        if reaction["reaction"] in ("comment", "repost") and rng.random() < 0.5:
+            calls.insert(0, REACTION_TOOLS["like"])
+        chunks = []
+        for tool_name in calls:
+            args = {"agent_id": agent["name"], "ad_id": ad_id}
+            if tool_name == "agent_comment_ad":
+                args["comment_text"] = reaction["final_message"]
+            elif tool_name == "agent_repost_ad":
+                args["repost_reason"] = reaction["final_message"]
+            tool_call_id = str(uuid.UUID(int=rng.getrandbits(128)))
+            chunks.append({"message_type": "tool_call_message",
+                           "tool_call": {"name": tool_name, "arguments": json.dumps(args), "tool_call_id": tool_call_id}})
+            chunks.append({"message_type": "tool_return_message", "tool_return": "None", "status": "success",
+                           "tool_call_id": tool_call_id})
+        return chunks
+
+
+class _FakeHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default listen backlog of 5 resets connections under bursts of concurrent streams.
+    request_queue_size = 1024
+
+
+class FakeLettaServer:
+    """Runs a fake Letta server on localhost in a background thread."""
+
+    def __init__(self, num_agents: int = 10, latency: float = 1.0, port: int = 0,
+                 throttle_rate: float = 0.0, behavior: FakeBehavior = None):
+        self.latency = latency
+        # Fraction of write calls answered with 429 Too Many Requests.
+        self.throttle_rate = throttle_rate
+        # By default every stream takes exactly `latency` and replies cleanly.
+        self.behavior = behavior or FakeBehavior(latency_median=latency, latency_sigma=0.0)
+        self.agents = {}
+        self.tools = {}
+        for i in range(num_agents):
+            agent_id = f"agent-{uuid.uuid4()}"
+            self.agents[agent_id] = {"id": agent_id, "name": f"fake_agent_{i}",
+                                     "persona": FAKE_PERSONAS[i % len(FAKE_PERSONAS)]}
+        self.stream_calls = 0
+        self.tool_writes = 0
+        self.write_calls = 0
+        self.throttled_calls = 0
+        self._lock = threading.Lock()
+        self._httpd = _FakeHTTPServer(("127.0.0.1", port), self._make_handler())
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def list_agents(self, query):
+        """Returns agents in creation order, honouring name/limit/after filters."""
+        agents = list(self.agents.values())
+        if "name" in query:
+            agents = [a for a in agents if a["name"] == query["name"][0]]
+        if "after" in query:
+            ids = [a["id"] for a in agents]
+            after = query["after"][0]
+            agents = agents[ids.index(after) + 1:] if after in ids else []
+        if "limit" in query:
+            agents = agents[:int(query["limit"][0])]
+        return agents
+
+    def list_tools(self, query):
+        """Returns registered tools, honouring the names filter."""
+        tools = list(self.tools.values())
+        if "names" in query:
+            tools = [t for t in tools if t["name"] in query["names"]]
+        return tools
+
+    def upsert_tool(self, body):
+        """Creates or replaces a tool, keyed by its schema name."""
+        name = body["json_schema"]["name"]
+        with self._lock:
+            self.tool_writes += 1
+            tool_id = self.tools[name]["id"] if name in self.tools else f"tool-{uuid.uuid4()}"
+            self.tools[name] = {"id": tool_id, "name": name, "tags": body.get("tags", []),
+                                "json_schema": body["json_schema"], "source_code": body.get("source_code")}
+            return self.tools[name]
+
+    def block(self, agent: dict, label: str) -> dict:
+        """Returns an agent's memory block, adding an empty interaction_history like the server would."""
+        with self._lock:
+            blocks = agent.setdefault("memory_blocks", [])
+            for block in blocks:
+                if block.get("label") == label:
+                    return block
+            if label != "interaction_history":
+                return None
+            block = {"label": label, "value": "", "limit": None}
+            blocks.append(block)
+            return block
+
+    def modify_block(self, agent: dict, label: str, body: dict):
+        """Updates a block's value and limit; returns (response body, HTTP status)."""
+        block = self.block(agent, label)
+        if block is None:
+            return {"detail": "Block not found"}, 404
+        with self._lock:
+            self.write_calls += 1
+            if body.get("limit") is not None:
+                block["limit"] = body["limit"]
+            value = body.get("value")
+            if value is not None:
+                if block.get("limit") is not None and len(value) > block["limit"]:
+                    return {"detail": f"Value exceeds the block's {block['limit']} character limit"}, 400
+                block["value"] = value
+        return block, 200
+
+    def _throttled(self):
+        """Counts a write call and decides whether to reject it with a 429."""
+        with self._lock:
+            self.write_calls += 1
+            if random.random() < self.throttle_rate:
+                self.throttled_calls += 1
+                return True
+        return False
+
+    def next_turn(self, agent: dict, text: str) -> dict:
+        """Counts a stream call and scripts the agent's reply (see FakeBehavior.plan_turn)."""
+        with self._lock:
+            self.stream_calls += 1
+            turn = agent["turns"] = agent.get("turns", 0) + 1
+        return self.behavior.plan_turn(agent, text, turn)
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, payload, status=200):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _read_body(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                return json.loads(self.rfile.read(length) or b"{}") if length else {}
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                path = url.path.rstrip("/")
+                parts = path.split("/")
+                if path == "/v1/agents":
+                    self._send_json(server.list_agents(parse_qs(url.query)))
+                # /v1/agents/{agent_id}/core-memory/blocks/{block_label}
+                elif len(parts) == 7 and parts[2] == "agents" and parts[4:6] == ["core-memory", "blocks"]:
+                    agent = server.agents.get(parts[3])
+                    block = server.block(agent, parts[6]) if agent else None
+                    if block is None:
+                        self._send_json({"detail": "Not found"}, status=404)
+                    else:
+                        self._send_json(block)
+                elif path == "/v1/tools":
+                    self._send_json(server.list_tools(parse_qs(url.query)))
+                else:
+                    self._send_json({"detail": "Not found"}, status=404)
+
+            def do_POST(self):
+                path = self.path.split("?")[0].rstrip("/")
+                parts = path.split("/")
+                if path == "/v1/agents":
+                    body = self._read_body()
+                    time.sleep(server.latency)
+                    if server._throttled():
+                        self._send_json({"detail": "Rate limit exceeded"}, status=429)
+                        return
+                    agent_id = f"agent-{uuid.uuid4()}"
+                    blocks = body.get("memory_blocks", [])
+                    agent = {"id": agent_id, "name": body.get("name"), "memory_blocks": blocks,
+                             "tags": body.get("tags", []),
+                             "persona": next((b["value"] for b in blocks if b.get("label") == "persona"), "")}
+                    with server._lock:
+                        server.agents[agent_id] = agent
+                    self._send_json(agent)
+                    return
+                # /v1/agents/{agent_id}/messages/stream
+                if len(parts) == 6 and parts[2] == "agents" and parts[4:] == ["messages", "stream"]:
+                    body = self._read_body()
+                    agent = server.agents.get(parts[3])
+                    if agent is None:
+                        self._send_json({"detail": "Agent not found"}, status=404)
+                        return
+                    plan = server.next_turn(agent, _message_text(body.get("messages")))
+                    time.sleep(plan["first_delay"])
+                    if plan["status"]:
+                        self._send_json({"detail": "Injected failure"}, status=plan["status"])
+                        return
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/event-stream")
+                    self.send_header("Connection", "close")
+                    self.end_headers()
+                    self.close_connection = True
+                    try:
+                        for i, chunk in enumerate(plan["chunks"]):
+                            if i == plan["break_after"]:
+                                # Drop the connection without finishing the stream.
+                                return
+                            if i and plan["chunk_delay"]:
+                                time.sleep(plan["chunk_delay"])
+                            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                            self.wfile.flush()
+                        self.wfile.write(b"data: [DONE]\n\n")
+                        self.wfile.flush()
+                    except (BrokenPipeError, ConnectionResetError):
+                        # The client closed the stream early (e.g. once it had the reaction).
+                        pass
+                else:
+                    self._send_json({"detail": "Not found"}, status=404)
+
+            def do_PUT(self):
+                path = self.path.split("?")[0].rstrip("/")
+                if path == "/v1/tools":
+                    self._send_json(server.upsert_tool(self._read_body()))
+                else:
+                    self._send_json({"detail": "Not found"}, status=404)
+
+            def do_PATCH(self):
+                parts = self.path.split("?")[0].rstrip("/").split("/")
+                agent = server.agents.get(parts[3]) if len(parts) > 3 and parts[2] == "agents" else None
+                if agent is None:
+                    self._send_json({"detail": "Not found"}, status=404)
+                # /v1/agents/{agent_id}/core-memory/blocks/{block_label}
+                elif len(parts) == 7 and parts[4:6] == ["core-memory", "blocks"]:
+                    payload, status = server.modify_block(agent, parts[6], self._read_body())
+                    self._send_json(payload, status=status)
+                # /v1/agents/{agent_id}/reset-messages
+                elif len(parts) == 5 and parts[4] == "reset-messages":
+                    with server._lock:
+                        server.write_calls += 1
+                    self._send_json(agent)
+                else:
+                    self._send_json({"detail": "Not found"}, status=404)
+
+            def do_DELETE(self):
+                parts = self.path.split("?")[0].rstrip("/").split("/")
+                # /v1/agents/{agent_id}
+                if len(parts) == 4 and parts[2] == "agents":
+                    time.sleep(server.latency)
+                    if server._throttled():
+                        self._send_json({"detail": "Rate limit exceeded"}, status=429)
+                        return
+                    with server._lock:
+                        agent = server.agents.pop(parts[3], None)
+                    if agent is None:
+                        self._send_json({"detail": "Agent not found"}, status=404)
+                        return
+                    self._send_json({})
+                else:
+                    self._send_json({"detail": "Not found"}, status=404)
+
+        return Handler
+
+
+class FakeApiError(Exception):
+    """Mirrors letta_client's ApiError: carries the HTTP status code and headers."""
+
+    def __init__(self, status_code: int, body=None):
+        super().__init__(f"status_code: {status_code}, body: {body}")
+        self.status_code = status_code
+        self.body = body
+        self.headers = {}
+
+
+def _to_namespace(value):
+    if isinstance(value, dict):
+        return SimpleNamespace(**{k: _to_namespace(v) for k, v in value.items()})
+    return value
+
+
+class FakeLettaClient:
+    """
+    An in-process stand-in for the letta_client `Letta` client, implementing the calls
+    this backend makes: agents.list/create/delete/modify, agents.messages.create_stream/reset,
+    agents.blocks.retrieve/modify and tools.list/upsert. Streams sleep on the calling
+    thread, so concurrency behaves as it does against a real server.
+    """
+
+    def __init__(self, num_agents: int = 100, behavior: FakeBehavior = None):
+        self.behavior = behavior or FakeBehavior()
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._agents = {}
+        self._tools = {}
+        self.stream_calls = 0
+        self.outcomes = {}
+        # Approximate input tokens of each stream call: memory blocks, message history and the new message.
+        self.input_tokens = []
+        # Calls that change server state (agent, block and tool writes and message resets).
+        self.write_calls = 0
+        self.agents = SimpleNamespace(
+            list=self._list_agents, create=self._create_agent, delete=self._delete_agent, modify=self._modify_agent,
+            messages=SimpleNamespace(create_stream=self._create_stream, reset=self._reset_messages),
+            blocks=SimpleNamespace(retrieve=self._retrieve_block, modify=self._modify_block),
+        )
+        self.tools = SimpleNamespace(list=self._list_tools, upsert=self._upsert_tool)
+        for i in range(num_agents):
+            self._create_agent(name=f"fake_agent_{i}", memory_blocks=[
+                {"label": "persona", "value": f"You are {FAKE_PERSONAS[i % len(FAKE_PERSONAS)]}."}])
+        self.write_calls = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(num_agents=int(os.getenv("FAKE_NUM_AGENTS", "100")), behavior=FakeBehavior.from_env())
+
+    def _list_agents(self, limit: int = None, after: str = None, name: str = None, **kwargs):
+        with self._lock:
+            agents = list(self._agents.values())
+        if name is not None:
+            agents = [a for a in agents if a.name == name]
+        if after is not None:
+            ids = [a.id for a in agents]
+            agents = agents[ids.index(after) + 1:] if after in ids else []
+        return agents[:limit] if limit else agents
+
+    def _create_agent(self, name: str, memory_blocks: list = None, tags: list = None,
+                      message_buffer_autoclear: bool = False, model: str = None, embedding: str = None, **kwargs):
+        blocks = [SimpleNamespace(label=b.get("label"), value=b.get("value"), limit=b.get("limit"))
+                  for b in memory_blocks or []]
+        if not any(b.label == "interaction_history" for b in blocks):
+            blocks.append(SimpleNamespace(label="interaction_history", value="", limit=None))
+        with self._lock:
+            agent_id = f"agent-{uuid.UUID(int=next(self._ids))}"
+            agent = SimpleNamespace(id=agent_id, name=name, tags=list(tags or []), created_at=_now(),
+                                    memory=SimpleNamespace(blocks=blocks), history=[],
+                                    message_buffer_autoclear=message_buffer_autoclear,
+                                    llm_config=SimpleNamespace(handle=model),
+                                    embedding_config=SimpleNamespace(handle=embedding))
+            self._agents[agent_id] = agent
+            self.write_calls += 1
+        return agent
+
+    def _modify_agent(self, agent_id: str, name: str = None, tags: list = None, model: str = None,
+                      embedding: str = None, **kwargs):
+        with self._lock:
+            agent = self._get_agent(agent_id)
+            self.write_calls += 1
+            if name is not None:
+                agent.name = name
+            if tags is not None:
+                agent.tags = list(tags)
+            if model is not None:
+                agent.llm_config.handle = model
+            if embedding is not None:
+                agent.embedding_config.handle = embedding
+            return agent
+
+    def _delete_agent(self, agent_id: str, **kwargs):
+        with self._lock:
+            if self._agents.pop(agent_id, None) is None:
+                raise FakeApiError(404, "Agent not found")
+            self.write_calls += 1
+
+    def _get_agent(self, agent_id: str):
+        agent = self._agents.get(agent_id)
+        if agent is None:
+            raise FakeApiError(404, "Agent not found")
+        return agent
+
+    def _create_stream(self, agent_id: str, messages: list, **kwargs):
+        text = _message_text(messages)
+        with self._lock:
+            agent = self._get_agent(agent_id)
+            self.stream_calls += 1
+            agent.turns = getattr(agent, "turns", 0) + 1
+            turn = agent.turns
+            context = [b.value or "" for b in agent.memory.blocks] + agent.history + [text]
+        persona = next((b.value for b in agent.memory.blocks if b.label == "persona"), "")
+        plan = self.behavior.plan_turn({"id": agent.id, "name": agent.name, "persona": persona}, text, turn)
+        reply = "".join(c.get("content") or json.dumps(c.get("tool_call") or "") for c in plan["chunks"])
+        with self._lock:
+            self.outcomes[plan["kind"]] = self.outcomes.get(plan["kind"], 0) + 1
+            self.input_tokens.append(sum(len(_TOKEN_RE.findall(part)) for part in context))
+            # The turn stays in the agent's message history unless it clears it every turn.
+            if not agent.message_buffer_autoclear:
+                agent.history.extend([text, reply])
+        if plan["status"]:
+            time.sleep(plan["first_delay"])
+            raise FakeApiError(plan["status"], "Injected failure")
+        return self._stream(plan)
+
+    def _stream(self, plan: dict):
+        time.sleep(plan["first_delay"])
+        for i, chunk in enumerate(plan["chunks"]):
+            if i == plan["break_after"]:
+                raise ConnectionResetError("Fake stream dropped mid-response")
+            if i and plan["chunk_delay"]:
+                time.sleep(plan["chunk_delay"])
+            yield _to_namespace(chunk)
+
+    def _reset_messages(self, agent_id: str, **kwargs):
+        with self._lock:
+            agent = self._get_agent(agent_id)
+            agent.history = []
+            self.write_calls += 1
+            return agent
+
+    def _retrieve_block(self, agent_id: str, block_label: str, **kwargs):
+        with self._lock:
+            for block in self._get_agent(agent_id).memory.blocks:
+                if block.label == block_label:
+                    return block
+        raise FakeApiError(404, f"Block '{block_label}' not found")
+
+    def _modify_block(self, agent_id: str, block_label: str, value: str = None, limit: int = None, **kwargs):
+        block = self._retrieve_block(agent_id, block_label)
+        with self._lock:
+            self.write_calls += 1
+            if limit is not None:
+                block.limit = limit
+            if value is not None:
+                if block.limit is not None and len(value) > block.limit:
+                    raise FakeApiError(400, f"Value exceeds the block's {block.limit} character limit")
+                block.value = value
+            return block
+
+    def _list_tools(self, names=None, limit: int = None, **kwargs):
+        with self._lock:
+            tools = [t for t in self._tools.values() if names is None or t.name in names]
+        return tools[:limit] if limit else tools
+
+    def _upsert_tool(self, json_schema: dict, source_code: str, tags: list = None, **kwargs):
+        name = json_schema["name"]
+        with self._lock:
+            tool_id = self._tools[name].id if name in self._tools else f"tool-{uuid.uuid4()}"
+            self._tools[name] = SimpleNamespace(id=tool_id, name=name, tags=list(tags or []),
+                                                json_schema=json_schema, source_code=source_code)
+            self.write_calls += 1
+            return self._tools[name]
@@ -0,0 +1,112 @@
+import os
+import time
+import uuid
+import asyncio
+
+# A small in-process job queue for long-running work (simulations, agent provisioning)
+# so HTTP handlers can return a job id immediately instead of holding the request open.
+# The queue is bounded and drained by a fixed number of background workers.
+
+JOB_QUEUE_MAX_SIZE = int(os.getenv("JOB_QUEUE_MAX_SIZE", "100"))
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", "2"))
+JOB_HISTORY_SIZE = int(os.getenv("JOB_HISTORY_SIZE", "500"))
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity."""
+
+
+class Job:
+    """A unit of background work and its current status."""
+
+    def __init__(self, kind: str, func, args: tuple):
+        self.id = str(uuid.uuid4())
+        self.kind = kind
+        self.func = func
+        self.args = args
+        self.status = "queued"
+        self.progress = None
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.finished = asyncio.Event()
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": self.progress,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobQueue:
+    """A bounded asyncio queue drained by `concurrency` worker tasks."""
+
+    def __init__(self, max_size: int = JOB_QUEUE_MAX_SIZE, concurrency: int = JOB_CONCURRENCY,
+                 history_size: int = JOB_HISTORY_SIZE):
+        self.max_size = max_size
+        self.concurrency = concurrency
+        self.history_size = history_size
+        self.jobs = {}
+        self._queue = None
+        self._workers = []
+
+    def _ensure_started(self):
+        # Workers are started lazily so they bind to the server's running event loop.
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_size)
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    def submit(self, kind: str, func, *args) -> Job:
+        """
+        Queues `await func(job, *args)` and returns the Job right away.
+        Raises QueueFullError if the queue is at capacity.
+        """
+        self._ensure_started()
+        job = Job(kind, func, args)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise QueueFullError(f"Job queue is full ({self.max_size} jobs pending).")
+        self.jobs[job.id] = job
+        self._prune_history()
+        return job
+
+    def get(self, job_id: str):
+        return self.jobs.get(job_id)
+
+    def _prune_history(self):
+        """Forgets the oldest finished jobs once more than history_size are kept."""
+        finished = [job for job in self.jobs.values() if job.finished.is_set()]
+        for job in finished[:max(0, len(finished) - self.history_size)]:
+            del self.jobs[job.id]
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            job.status = "running"
+            job.started_at = time.time()
+            try:
+                job.result = await job.func(job, *job.args)
+                job.status = "succeeded"
+            except (Exception, SystemExit) as e:
+                # SystemExit too: CLI-oriented helpers (e.g. register_tools) exit on failure,
+                # which must not take the worker down with them.
+                print(f"Job {job.id} ({job.kind}) failed: {e}")
+                job.error = f"Exited with status {e.code}" if isinstance(e, SystemExit) else str(e)
+                job.status = "failed"
+            finally:
+                job.finished_at = time.time()
+                job.finished.set()
+                self._queue.task_done()
+
+
+JOB_QUEUE = JobQueue()
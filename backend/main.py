@@ -1,33 +1,28 @@
 import sys
-import uvicorn
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
 
-# We are creating a simple CLI runner, so FastAPI app is not strictly needed for now,
-# but we'll keep it for potential future API endpoints.
-app = FastAPI()
+# Command-line entry point. Each subcommand imports only what it needs, so e.g.
+# `create` never loads FastAPI/uvicorn; the web app itself lives in server.py.
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-@app.get("/")
-def read_root():
-    return {"message": "Digital Clone Simulation Environment"}
+def __getattr__(name):
+    # Keeps `backend.main:app` working for ASGI servers without importing FastAPI eagerly.
+    if name == "app":
+        from backend.server import app
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def print_usage():
     """Prints the command usage instructions."""
     print("Usage: python -m backend.main [command]")
     print("\nCommands:")
     print("  create       - Run the agent creation script to populate agents.")
-    print("  simulate     - Run the ad simulation with the existing agents.")
-    print("  serve        - (Future use) Starts the FastAPI web server.")
+    print("  reconcile    - Create, update and delete agents to match the persona CSV")
+    print("                 (options: [csv_path] --dry-run --keep-removed).")
+    print("  simulate     - Present every ad in data/ads to the existing agents")
+    print("                 (options: [ads_dir] --max-in-flight N --no-cache).")
+    print("  serve        - Starts the FastAPI web server.")
     print("\nExamples:")
     print("  python -m backend.main create")
+    print("  python -m backend.main reconcile --dry-run")
     print("  python -m backend.main simulate")
 
 def main():
@@ -42,12 +37,17 @@ def main():
         print("Running agent creation module...")
         from backend.create_agents import main as create_main
         create_main()
+    elif command == "reconcile":
+        from backend.reconcile import main as reconcile_main
+        reconcile_main(sys.argv[2:])
     elif command == "simulate":
         print("Running simulation module...")
         from backend.simulation import main as simulate_main
-        simulate_main()
+        simulate_main(sys.argv[2:])
     elif command == "serve":
         print("Starting FastAPI server...")
+        import uvicorn
+        from backend.server import app
         uvicorn.run(app, host="0.0.0.0", port=8000)
     else:
         print(f"Error: Unknown command '{command}'")
@@ -0,0 +1,218 @@
+import os
+import sys
+import time
+import logging
+import threading
+
+# Process-wide instrumentation for agent interactions. Each interaction is timed by an
+# InteractionTrace (queue wait, time to first chunk and first tool call, stream time,
+# chunk count, output length, follow-ups, parse failures) and folded into cumulative
+# histograms, which the server exposes in the Prometheus text format at /metrics.
+#
+# Also sets up leveled logging for the backend. Per-agent and per-chunk messages are
+# logged at DEBUG with lazy %-formatting, so they cost a level check when disabled.
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+SECONDS_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+CHUNK_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+CHARS_BUCKETS = (50, 100, 250, 500, 1000, 2000, 4000, 8000)
+
+
+def get_logger(name: str) -> logging.Logger:
+    """
+    Returns a logger under the 'backend' hierarchy. The first call attaches a stdout
+    handler at LOG_LEVEL, unless the application has configured one already.
+    """
+    root = logging.getLogger("backend")
+    if not root.handlers:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(logging.Formatter("%(levelname)s %(name)s: %(message)s"))
+        root.addHandler(handler)
+        root.setLevel(LOG_LEVEL)
+    return logging.getLogger(name)
+
+
+def _format_value(value: float) -> str:
+    return "+Inf" if value == float("inf") else repr(float(value))
+
+
+class Histogram:
+    """Thread-safe cumulative histogram with fixed upper bounds, as Prometheus exposes them."""
+
+    def __init__(self, name: str, help_text: str, buckets: tuple):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets) + (float("inf"),)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+                    break
+            self.sum += value
+            self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th quantile (the usual histogram estimate)."""
+        with self._lock:
+            target = q * self.count
+            seen = 0
+            for bound, count in zip(self.buckets, self.counts):
+                seen += count
+                if count and seen >= target:
+                    return bound
+        return 0.0
+
+    def render(self) -> list:
+        with self._lock:
+            lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+            cumulative = 0
+            for bound, count in zip(self.buckets, self.counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{le="{_format_value(bound)}"}} {cumulative}')
+            lines.append(f"{self.name}_sum {self.sum!r}")
+            lines.append(f"{self.name}_count {self.count}")
+        return lines
+
+
+class Counter:
+    """Thread-safe counter with one optional label."""
+
+    def __init__(self, name: str, help_text: str, label: str = None):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_value: str = None, amount: int = 1):
+        with self._lock:
+            self.values[label_value] = self.values.get(label_value, 0) + amount
+
+    def render(self) -> list:
+        with self._lock:
+            lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+            for label_value, value in sorted(self.values.items(), key=lambda item: str(item[0])):
+                labels = f'{{{self.label}="{label_value}"}}' if self.label else ""
+                lines.append(f"{self.name}{labels} {value}")
+        return lines
+
+
+class SimulationMetrics:
+    """The histograms and counters fed by finished interaction traces."""
+
+    def __init__(self):
+        self.queue_wait = Histogram("simulation_queue_wait_seconds",
+                                    "Time from scheduling an interaction to starting it.", SECONDS_BUCKETS)
+        self.first_chunk = Histogram("simulation_time_to_first_chunk_seconds",
+                                     "Time from sending the ad to the first streamed chunk.", SECONDS_BUCKETS)
+        self.first_tool_call = Histogram("simulation_time_to_first_tool_call_seconds",
+                                         "Time from sending the ad to the first tool call.", SECONDS_BUCKETS)
+        self.stream_time = Histogram("simulation_stream_seconds",
+                                     "Time spent consuming the agent's response stream.", SECONDS_BUCKETS)
+        self.chunks = Histogram("simulation_stream_chunks", "Chunks streamed per interaction.", CHUNK_BUCKETS)
+        self.output_chars = Histogram("simulation_output_chars",
+                                      "Assistant text characters streamed per interaction.", CHARS_BUCKETS)
+        self.interactions = Counter("simulation_interactions_total",
+                                    "Finished interactions by outcome.", label="outcome")
+        self.follow_ups = Counter("simulation_follow_ups_total", "Interactions that needed a follow-up call.")
+        self.parse_failures = Counter("simulation_parse_failures_total",
+                                      "Interactions whose reaction could not be parsed.")
+
+    def record(self, trace: dict):
+        """Folds one finished trace (see InteractionTrace.finish) into the metrics."""
+        for histogram, key in ((self.queue_wait, "queue_wait"), (self.first_chunk, "time_to_first_chunk"),
+                               (self.first_tool_call, "time_to_first_tool_call"),
+                               (self.stream_time, "stream_seconds"), (self.chunks, "chunks"),
+                               (self.output_chars, "output_chars")):
+            if trace.get(key) is not None:
+                histogram.observe(trace[key])
+        self.interactions.inc(trace["outcome"])
+        if trace["follow_up"]:
+            self.follow_ups.inc()
+        if trace["outcome"] == "parse_failure":
+            self.parse_failures.inc()
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in (self.queue_wait, self.first_chunk, self.first_tool_call, self.stream_time, self.chunks,
+                       self.output_chars, self.interactions, self.follow_ups, self.parse_failures):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+METRICS = SimulationMetrics()
+
+
+class InteractionTrace:
+    """
+    Times one agent interaction. Call start() when the interaction leaves the queue,
+    stream_started() just before each create_stream call, stream_finished() once it
+    has been consumed, on_chunk() for every chunk and finish() once; only the primary
+    stream counts towards the first-chunk and first-tool-call times. If a stream never
+    finished (e.g. create_stream raised), the stream time is unknown and reported as
+    None. Not thread-safe: a trace belongs to one worker thread.
+    """
+
+    def __init__(self, agent_id: str, ad_id: str, queued_at: float = None):
+        self.agent_id = agent_id
+        self.ad_id = ad_id
+        self.queued_at = queued_at
+        self.started_at = None
+        self.stream_start = None
+        self.first_chunk = None
+        self.first_tool_call = None
+        self.stream_seconds = 0.0
+        self.streaming = False
+        self.chunks = 0
+        self.output_chars = 0
+        self.follow_up = False
+
+    def start(self):
+        self.started_at = time.perf_counter()
+
+    def stream_started(self):
+        self.stream_start = time.perf_counter()
+        self.streaming = True
+
+    def stream_finished(self):
+        self.stream_seconds += time.perf_counter() - self.stream_start
+        self.streaming = False
+
+    def on_chunk(self, chunk):
+        now = time.perf_counter()
+        self.chunks += 1
+        if not self.follow_up:
+            if self.first_chunk is None:
+                self.first_chunk = now - self.stream_start
+            if chunk.message_type == "tool_call_message" and self.first_tool_call is None:
+                self.first_tool_call = now - self.stream_start
+        if chunk.message_type == "assistant_message" and chunk.content:
+            self.output_chars += len(chunk.content)
+
+    def finish(self, outcome: str, metrics: SimulationMetrics = METRICS) -> dict:
+        """
+        Records the trace into `metrics` and returns it as a dict. `outcome` is 'ok',
+        'parse_failure', 'error' or 'cancelled'.
+        """
+        trace = {
+            "agent_id": self.agent_id,
+            "ad_id": self.ad_id,
+            "outcome": outcome,
+            "queue_wait": self.started_at - self.queued_at if self.queued_at and self.started_at else None,
+            "time_to_first_chunk": self.first_chunk,
+            "time_to_first_tool_call": self.first_tool_call,
+            "stream_seconds": self.stream_seconds if self.stream_start and not self.streaming else None,
+            "chunks": self.chunks,
+            "output_chars": self.output_chars,
+            "follow_up": self.follow_up,
+        }
+        metrics.record(trace)
+        return trace
@@ -0,0 +1,137 @@
+import os
+import csv
+
+# Streaming reader for persona CSVs. The header is validated before any row is read,
+# then rows are parsed, normalized and yielded one at a time, so a file of any size is
+# ingested without holding it in memory (only the set of names seen so far is kept,
+# to drop duplicates). Bad rows are counted by reason in one pass and reported at the end.
+# Files are decoded with errors="replace", so bytes that aren't UTF-8 turn a row into a bad
+# row instead of aborting the ingest partway through.
+
+# Accepted header names for each column, in order of preference (compared case-insensitively).
+NAME_COLUMNS = ["agent_name", "name"]
+DESCRIPTION_COLUMNS = ["personality_description", "personality", "description"]
+PERSONA_NAME_MAX_LENGTH = int(os.getenv("PERSONA_NAME_MAX_LENGTH", "100"))
+# How many bad rows are kept (with their line numbers) for the report.
+BAD_ROW_SAMPLE_SIZE = int(os.getenv("BAD_ROW_SAMPLE_SIZE", "20"))
+
+
+class PersonaSchemaError(ValueError):
+    """Raised when a persona CSV's header lacks a name or description column."""
+
+
+class IngestReport:
+    """Counts of valid, duplicate and bad rows, plus a sample of the bad ones."""
+
+    def __init__(self, sample_size: int = BAD_ROW_SAMPLE_SIZE):
+        self.sample_size = sample_size
+        self.rows = 0
+        self.valid = 0
+        self.bad = {}
+        self.samples = []
+
+    def add_bad(self, line: int, reason: str, row=None):
+        self.bad[reason] = self.bad.get(reason, 0) + 1
+        if len(self.samples) < self.sample_size:
+            self.samples.append({"line": line, "reason": reason, "row": row})
+
+    @property
+    def bad_rows(self) -> int:
+        return sum(self.bad.values())
+
+    def summary(self) -> dict:
+        return {"rows": self.rows, "valid": self.valid, "bad_rows": self.bad_rows, "bad_by_reason": dict(self.bad),
+                "bad_samples": self.samples}
+
+    def print_report(self):
+        print(f"Read {self.rows} persona rows: {self.valid} valid, {self.bad_rows} skipped.")
+        for reason, count in sorted(self.bad.items(), key=lambda item: -item[1]):
+            print(f"  - {count} rows: {reason}")
+        for sample in self.samples:
+            print(f"  - line {sample['line']}: {sample['reason']}: {str(sample['row'])[:100]}")
+        if self.bad_rows > len(self.samples):
+            print(f"  - ({self.bad_rows - len(self.samples)} more bad rows not shown)")
+
+
+def _find_column(header: list, candidates: list):
+    normalized = [column.strip().lower().lstrip("\ufeff") for column in header]
+    for candidate in candidates:
+        if candidate in normalized:
+            return normalized.index(candidate)
+    return None
+
+
+class PersonaReader:
+    """
+    Iterates (agent_name, personality_description) pairs from a persona CSV.
+    The header is checked on construction and raises PersonaSchemaError if no name or
+    description column is found. Names and descriptions are whitespace-normalized;
+    rows that are empty, malformed, over-long or repeat an earlier name are skipped
+    and recorded in `report`.
+    """
+
+    def __init__(self, file_obj):
+        self.report = IngestReport()
+        self._reader = csv.reader(file_obj)
+        header = next(self._reader, None)
+        if not header:
+            raise PersonaSchemaError("The persona CSV is empty.")
+        if any("\ufffd" in column or "\x00" in column for column in header):
+            raise PersonaSchemaError("The persona CSV must be UTF-8 encoded.")
+        self.width = len(header)
+        self.name_index = _find_column(header, NAME_COLUMNS)
+        self.description_index = _find_column(header, DESCRIPTION_COLUMNS)
+        missing = [f"'{columns[0]}'" for columns, index in ((NAME_COLUMNS, self.name_index),
+                                                             (DESCRIPTION_COLUMNS, self.description_index))
+                   if index is None]
+        if missing:
+            raise PersonaSchemaError(f"The persona CSV has no {' or '.join(missing)} column "
+                                     f"(found: {', '.join(header)}).")
+        self._seen = set()
+
+    def __iter__(self):
+        report = self.report
+        while True:
+            try:
+                row = next(self._reader)
+            except StopIteration:
+                return
+            except csv.Error as e:
+                report.rows += 1
+                report.add_bad(self._reader.line_num, f"unparseable ({e})")
+                continue
+            if not any(field.strip() for field in row):
+                continue
+            report.rows += 1
+            line = self._reader.line_num
+            if len(row) != self.width:
+                report.add_bad(line, f"expected {self.width} fields, found {len(row)}", row)
+                continue
+            if any("\ufffd" in field for field in row):
+                report.add_bad(line, "invalid UTF-8", row)
+                continue
+            name = " ".join(row[self.name_index].split())
+            description = " ".join(row[self.description_index].split())
+            if not name:
+                report.add_bad(line, "missing name", row)
+            elif not description:
+                report.add_bad(line, "missing personality description", row)
+            elif len(name) > PERSONA_NAME_MAX_LENGTH:
+                report.add_bad(line, f"name longer than {PERSONA_NAME_MAX_LENGTH} characters", row)
+            elif name in self._seen:
+                report.add_bad(line, "duplicate name", row)
+            else:
+                self._seen.add(name)
+                report.valid += 1
+                yield name, description
+
+
+def open_persona_csv(csv_path: str):
+    """Opens a persona CSV file for PersonaReader; undecodable bytes become U+FFFD (a bad row)."""
+    return open(csv_path, 'r', encoding='utf-8-sig', errors='replace', newline='')
+
+
+def read_persona_texts(csv_path: str) -> dict:
+    """Maps agent_name -> personality_description for every valid row of a persona CSV file."""
+    with open_persona_csv(csv_path) as f:
+        return dict(PersonaReader(f))
@@ -0,0 +1,188 @@
+import os
+import re
+import string
+import threading
+from functools import lru_cache
+
+# Prompt templates. Each version has a static part, written into the persona block once
+# when an agent is created, and a per-ad message sent on every interaction. Keeping
+# the instructions, JSON schema and example in the persona means each call only sends
+# the ad itself, and the unchanging persona gives the provider a stable prefix to cache.
+#
+# Agents are tagged with the template version they were created with, so agents
+# created before a template change keep getting messages they understand.
+
+PROMPT_TEMPLATE_VERSION = os.getenv("PROMPT_TEMPLATE_VERSION", "v2")
+TEMPLATE_TAG_PREFIX = "prompt-template:"
+# Agents without a template tag predate versioning and use the original prompt.
+LEGACY_TEMPLATE_VERSION = "v1"
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+V1_PERSONA = """
+You are a person with the following personality: {personality_text}.
+Your name is {agent_name}.
+You are interacting with a social media feed. When you see an ad, you MUST use one or more of the provided tools to react.
+You can use agent_like_ad, agent_dislike_ad, agent_comment_ad, agent_repost_ad, or agent_ignore_ad.
+After using the tools, output a short, final message expressing your overall opinion.
+    """
+
+V1_AD_MESSAGE = """
+You are on a social media platform and you see the following ad.
+Your name is {agent_name}. Your personality is stored in your 'persona' memory block.
+
+Ad Content: "{ad_content}"
+
+You must complete this task in TWO PHASES:
+
+PHASE 1 - TAKE ACTIONS:
+Based on your persona, use the provided tools to react to this ad. You can use one or more tools (e.g., like and comment).
+
+PHASE 2 - PROVIDE ANALYSIS (MANDATORY):
+After your tool calls, you MUST immediately provide a JSON analysis of your reaction.
+
+Your JSON response must be a single line with no other text, starting with {{{{ and ending with }}}}.
+
+**If you took multiple actions, for the "reaction" field in the JSON, choose the one that you feel is your PRIMARY reaction.** For example, if you liked and commented, and the comment is more significant, use "comment".
+
+Required format:
+{{"reaction": "primary_action", "confidence": 0-100, "reasoning": "why you reacted this way", "tags": ["keyword1", "keyword2"], "final_message": "your social media post"}}
+
+The `reaction` value should be one of `like`, `dislike`, `comment`, `repost`, or `ignore`.
+
+IMPORTANT: You MUST complete both phases. Do not stop after phase 1.
+
+Example complete interaction:
+1. [Agent uses tool: agent_like_ad]
+2. [Agent uses tool: agent_comment_ad]
+3. {{"reaction": "comment", "confidence": 90, "reasoning": "I liked it, but my main action is commenting to ask for more details.", "tags": ["eco", "fashion"], "final_message": "Love it! Can you provide more info on your ethical sourcing?"}}
+"""
+
+V2_PERSONA = """You are {agent_name}, a person on a social media feed. Your personality: {personality_text}
+
+Each ad arrives as a message of the form Ad <ad_id>: "<ad text>". For every ad:
+1. React in character with one or more tools: agent_like_ad, agent_dislike_ad, agent_comment_ad, agent_repost_ad, agent_ignore_ad.
+2. Then reply with one line of JSON and nothing else:
+{{"reaction": "like|dislike|comment|repost|ignore", "confidence": 0-100, "reasoning": "why", "tags": ["keyword"], "final_message": "your post"}}
+If you used several tools, "reaction" is the primary one (a comment over a like). Always do both steps.
+Example: [agent_like_ad] [agent_comment_ad] {{"reaction": "comment", "confidence": 90, "reasoning": "I want to know more about the sourcing.", "tags": ["eco", "fashion"], "final_message": "Love it! Where is it made?"}}"""
+
+V2_AD_MESSAGE = 'Ad {ad_id}: "{ad_content}"'
+
+TEMPLATES = {
+    "v1": {"persona": V1_PERSONA, "ad_message": V1_AD_MESSAGE},
+    "v2": {"persona": V2_PERSONA, "ad_message": V2_AD_MESSAGE},
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximates a token count as words plus punctuation marks."""
+    return len(_TOKEN_RE.findall(text))
+
+
+def template_tag(version: str = PROMPT_TEMPLATE_VERSION) -> str:
+    return TEMPLATE_TAG_PREFIX + version
+
+
+def agent_template_version(agent) -> str:
+    """The template version an agent was created with, read from its tags."""
+    for tag in getattr(agent, "tags", None) or []:
+        if tag.startswith(TEMPLATE_TAG_PREFIX) and tag[len(TEMPLATE_TAG_PREFIX):] in TEMPLATES:
+            return tag[len(TEMPLATE_TAG_PREFIX):]
+    return LEGACY_TEMPLATE_VERSION
+
+
+def render_persona(agent_name: str, personality_text: str, version: str = PROMPT_TEMPLATE_VERSION) -> str:
+    """Builds the persona block, including the template's static instructions."""
+    return TEMPLATES[version]["persona"].format(agent_name=agent_name, personality_text=personality_text)
+
+
+def render_ad_message(agent, ad_id: str, ad_content: str) -> tuple:
+    """Builds the per-ad message for `agent`; returns (template version, message)."""
+    version = agent_template_version(agent)
+    message = TEMPLATES[version]["ad_message"].format(agent_name=agent.name, ad_id=ad_id, ad_content=ad_content)
+    return version, message
+
+
+def persona_block_text(agent):
+    """
+    The agent's persona block text: from an AgentRecord (see agent_registry.py), or from
+    an agent state that carries its memory. None if neither is available.
+    """
+    persona = getattr(agent, "persona", None)
+    if isinstance(persona, str):
+        return persona
+    memory = getattr(agent, "memory", None)
+    for block in getattr(memory, "blocks", None) or []:
+        if getattr(block, "label", None) == "persona":
+            return block.value or ""
+    return None
+
+
+@lru_cache(maxsize=None)
+def _persona_pattern(version: str):
+    """A regex matching personas rendered from `version`, capturing the personality text."""
+    parts, seen = [], set()
+    for literal, field, _, _ in string.Formatter().parse(TEMPLATES[version]["persona"].strip()):
+        parts.append(re.escape(literal))
+        if field:
+            parts.append(f"(?P={field})" if field in seen else f"(?P<{field}>.*?)")
+            seen.add(field)
+    return re.compile("".join(parts), re.DOTALL)
+
+
+def parse_persona(persona: str, version: str = PROMPT_TEMPLATE_VERSION) -> str:
+    """Recovers the personality text from a persona block; returns the block itself if it doesn't match."""
+    match = _persona_pattern(version).fullmatch((persona or "").strip())
+    return match.group("personality_text").strip() if match else persona
+
+
+class PromptUsage:
+    """Thread-safe count of per-ad message tokens sent, by template version."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = {}
+        self.tokens = {}
+
+    def record(self, version: str, message: str):
+        tokens = estimate_tokens(message)
+        with self._lock:
+            self.calls[version] = self.calls.get(version, 0) + 1
+            self.tokens[version] = self.tokens.get(version, 0) + tokens
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {
+                version: {
+                    "calls": self.calls[version],
+                    "message_tokens": self.tokens[version],
+                    "avg_message_tokens": self.tokens[version] / self.calls[version],
+                }
+                for version in self.calls
+            }
+
+
+PROMPT_USAGE = PromptUsage()
+
+
+def compare_templates(ad_content: str, agent_name: str = "sample_agent", personality_text: str = "") -> dict:
+    """Token cost of each template version for one ad: the static persona and the per-ad message."""
+    agent = type("Agent", (), {"name": agent_name})
+    report = {}
+    for version, template in TEMPLATES.items():
+        agent.tags = [template_tag(version)]
+        report[version] = {
+            "persona_tokens": estimate_tokens(render_persona(agent_name, personality_text, version)),
+            "message_tokens": estimate_tokens(render_ad_message(agent, "sample_ad", ad_content)[1]),
+        }
+    return report
+
+
+if __name__ == "__main__":
+    sample_ad = os.path.join(os.path.dirname(__file__), '..', 'data', 'ads', 'sample_ad.txt')
+    with open(sample_ad, 'r', encoding='utf-8') as f:
+        ad = f.read()
+    for version, costs in compare_templates(ad).items():
+        print(f"{version}: persona {costs['persona_tokens']} tokens (once per agent), "
+              f"per-ad message {costs['message_tokens']} tokens")
@@ -0,0 +1,118 @@
+import time
+import random
+import asyncio
+
+# Shared helpers for talking to the Letta API at scale: a token-bucket rate limiter
+# and a retry wrapper that backs off on throttling (429) and server errors (5xx).
+# 409 Conflict is not retried: it means the request clashed with existing state (e.g.
+# a duplicate), and sending it again can only clash again.
+
+RETRYABLE_STATUS_CODES = {408, 429}
+
+
+class TokenBucket:
+    """
+    An asyncio token bucket. `rate` tokens are added per second, up to `capacity`.
+    Each acquire() takes one token, waiting until one is available.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class AdaptiveTokenBucket(TokenBucket):
+    """
+    A token bucket whose rate adapts to the server (AIMD).
+    It runs at `max_rate` until the server throttles us, then halves its rate
+    (at most once per `cooldown` seconds, since one burst yields many 429s) and
+    creeps back up by `increase` tokens/s per successful call.
+    """
+
+    def __init__(self, max_rate: float, min_rate: float = 0.5, increase: float = 0.5,
+                 cooldown: float = 1.0):
+        super().__init__(max_rate)
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.increase = increase
+        self.cooldown = cooldown
+        self.throttle_count = 0
+        self.last_decrease = 0.0
+
+    def on_success(self):
+        self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self):
+        self.throttle_count += 1
+        now = time.monotonic()
+        if now - self.last_decrease < self.cooldown:
+            return
+        self.last_decrease = now
+        self.rate = max(self.min_rate, self.rate / 2)
+        # Drain any burst so the lower rate takes effect immediately.
+        self.tokens = min(self.tokens, 0)
+
+
+def get_status_code(exc: Exception):
+    """Returns the HTTP status code carried by a letta_client ApiError, if any."""
+    return getattr(exc, "status_code", None)
+
+
+def is_retryable(exc: Exception) -> bool:
+    """True for throttling, server-side errors and dropped connections."""
+    status = get_status_code(exc)
+    if status is None:
+        # Transport errors (timeouts, resets) carry no status code.
+        return type(exc).__module__.startswith("httpx")
+    return status in RETRYABLE_STATUS_CODES or status >= 500
+
+
+def retry_after_seconds(exc: Exception):
+    """Reads a Retry-After header (in seconds) from an ApiError, if present."""
+    headers = getattr(exc, "headers", None) or {}
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+async def call_with_retry(func, *args, executor=None, retries: int = 5, base_delay: float = 0.5,
+                          max_delay: float = 30.0, on_retry=None, **kwargs):
+    """
+    Runs the blocking `func(*args, **kwargs)` on `executor` and retries it with
+    exponential backoff and jitter when it fails with a retryable error.
+    `on_retry(exc, delay)` is called before each retry sleep.
+    """
+    loop = asyncio.get_running_loop()
+    attempt = 0
+    while True:
+        try:
+            return await loop.run_in_executor(executor, lambda: func(*args, **kwargs))
+        except Exception as e:
+            if attempt >= retries or not is_retryable(e):
+                raise
+            delay = retry_after_seconds(e)
+            if delay is None:
+                delay = min(max_delay, base_delay * (2 ** attempt)) * random.uniform(0.5, 1.0)
+            attempt += 1
+            if on_retry:
+                on_retry(e, delay)
+            await asyncio.sleep(delay)
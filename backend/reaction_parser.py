@@ -0,0 +1,179 @@
+import re
+import json
+
+# Incremental extraction of the agent's reaction JSON from a streamed response.
+# The extractor tracks brace depth (ignoring braces inside strings) as chunks arrive
+# and hands back the first complete object that validates as a reaction, so the
+# stream can be closed without waiting for any trailing text.
+
+REACTION_TYPES = {"like", "dislike", "comment", "repost", "ignore"}
+
+
+def validate_reaction(obj) -> dict:
+    """
+    Checks a parsed object against the reaction schema and normalizes it.
+    Returns the normalized dict, or None if it isn't a reaction.
+    """
+    if not isinstance(obj, dict):
+        return None
+    reaction = obj.get("reaction")
+    if not isinstance(reaction, str) or reaction.strip().lower() not in REACTION_TYPES:
+        return None
+    obj["reaction"] = reaction.strip().lower()
+
+    if "confidence" in obj:
+        try:
+            confidence = float(obj["confidence"])
+        except (TypeError, ValueError):
+            return None
+        if not 0 <= confidence <= 100:
+            return None
+        obj["confidence"] = int(confidence) if confidence.is_integer() else confidence
+    if "tags" in obj and not isinstance(obj["tags"], list):
+        return None
+    for field in ("reasoning", "final_message"):
+        if field in obj and not isinstance(obj[field], str):
+            return None
+    return obj
+
+
+def parse_json_object(json_str: str):
+    """Parses a JSON object, retrying once with trailing commas removed."""
+    try:
+        return json.loads(json_str)
+    except json.JSONDecodeError:
+        # Remove any trailing commas before closing braces/brackets
+        cleaned = re.sub(r',(\s*[}\]])', r'\1', json_str)
+        try:
+            return json.loads(cleaned)
+        except json.JSONDecodeError:
+            return None
+
+
+class IncrementalJSONExtractor:
+    """
+    Consumes text chunks and finds the first brace-balanced object that parses and
+    passes `validator`. feed() returns that object once found, otherwise None.
+    """
+
+    def __init__(self, validator=validate_reaction):
+        self.validator = validator
+        self.result = None
+        self.candidates = 0
+        self._parts = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, chunk: str):
+        if self.result is not None:
+            return self.result
+        start = 0
+        for i, ch in enumerate(chunk):
+            if self._depth == 0:
+                if ch == "{":
+                    self._depth = 1
+                    start = i
+                continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                self._depth += 1
+            elif ch == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._parts.append(chunk[start:i + 1])
+                    candidate = "".join(self._parts)
+                    self._parts = []
+                    self.candidates += 1
+                    obj = self.validator(parse_json_object(candidate))
+                    if obj is not None:
+                        self.result = obj
+                        return obj
+        if self._depth > 0:
+            self._parts.append(chunk[start:])
+        return None
+
+
+def extract_reaction(text: str):
+    """Returns the first valid reaction object in a complete piece of text, or None."""
+    return IncrementalJSONExtractor().feed(text)
+
+
+# When an agent acts through tools but never writes its JSON, the reaction can be
+# rebuilt from the tool calls alone. If it used several tools, the most expressive
+# one is its primary reaction (a comment says more than a like).
+TOOL_REACTIONS = {
+    "agent_comment_ad": "comment",
+    "agent_repost_ad": "repost",
+    "agent_dislike_ad": "dislike",
+    "agent_like_ad": "like",
+    "agent_ignore_ad": "ignore",
+}
+REACTION_PRIORITY = ["comment", "repost", "dislike", "like", "ignore"]
+TOOL_MESSAGE_ARGS = {"comment": "comment_text", "repost": "repost_reason"}
+# Tool calls carry no confidence, so derived reactions get the neutral midpoint; analytics
+# uses the same value for any row without one.
+DEFAULT_CONFIDENCE = 50
+DERIVED_REASONING = "Derived from the agent's tool calls; it gave no reasoning."
+# Fields of a derived reaction that hold defaults rather than anything the agent said.
+DERIVED_DEFAULT_FIELDS = ("confidence", "reasoning")
+
+
+def parse_tool_arguments(arguments) -> dict:
+    """Parses a tool call's JSON arguments string, returning {} if it isn't valid."""
+    if isinstance(arguments, dict):
+        return arguments
+    try:
+        parsed = json.loads(arguments or "{}")
+    except (TypeError, json.JSONDecodeError):
+        return {}
+    return parsed if isinstance(parsed, dict) else {}
+
+
+def derive_reaction_from_tool_calls(tool_calls: list):
+    """
+    Builds a reaction record from observed (tool_name, arguments) pairs.
+    Only the reaction and, for comments and reposts, the final message can be
+    derived; confidence is DEFAULT_CONFIDENCE, reasoning a fixed note and tags empty,
+    and `derived_from_tool_calls` marks the record. Returns None if the agent called
+    no reaction tools.
+    """
+    actions = {}
+    for tool_name, arguments in tool_calls:
+        reaction = TOOL_REACTIONS.get(tool_name)
+        if reaction and reaction not in actions:
+            actions[reaction] = parse_tool_arguments(arguments)
+    if not actions:
+        return None
+
+    primary = next(reaction for reaction in REACTION_PRIORITY if reaction in actions)
+    message_arg = TOOL_MESSAGE_ARGS.get(primary)
+    final_message = actions[primary].get(message_arg) if message_arg else None
+    return {
+        "reaction": primary,
+        "confidence": DEFAULT_CONFIDENCE,
+        "reasoning": DERIVED_REASONING,
+        "tags": [],
+        "final_message": final_message or "",
+        "actions": [reaction for reaction in REACTION_PRIORITY if reaction in actions],
+        "derived_from_tool_calls": True,
+    }
+
+
+def has_required_fields(record, required_fields) -> bool:
+    """
+    True if every required field in `record` holds a non-empty value. The defaults
+    in a derived reaction (DERIVED_DEFAULT_FIELDS) don't count as present.
+    """
+    if not record:
+        return False
+    defaulted = DERIVED_DEFAULT_FIELDS if record.get("derived_from_tool_calls") else ()
+    return all(record.get(field) not in (None, "", []) and field not in defaulted for field in required_fields)
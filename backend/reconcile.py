@@ -0,0 +1,224 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import hashlib
+import argparse
+from backend.agent_registry import AGENT_REGISTRY
+from backend.client import get_client
+from backend.create_agents import (
+    AGENT_CONFIG, EXECUTOR, PERSONALITIES_CSV, PROVISION_MAX_CONCURRENCY, PROVISION_MAX_RETRIES,
+    PROVISION_RATE_PER_SEC, provision_agents, register_tools,
+)
+from backend.persona_csv import PersonaReader, PersonaSchemaError, open_persona_csv
+from backend.prompts import agent_template_version, render_persona
+from backend.rate_limit import AdaptiveTokenBucket, call_with_retry, get_status_code
+
+# Declarative provisioning: the persona CSV describes the population we want, and
+# reconciling diffs it against the agents on the server (from the agent registry) to
+# make only the changes needed, keeping every surviving agent's memory:
+#   create         - a CSV name with no agent                      (agents.create)
+#   update_persona - the persona text changed                      (agents.blocks.modify)
+#   update_config  - the model or embedding differs from AGENT_CONFIG (agents.modify)
+#   delete         - an agent whose name is gone from the CSV, or a duplicate name
+# Agents are compared by a hash of name, persona and model config. Personas are rendered
+# with the template version each agent already uses, so template upgrades never show as edits.
+
+RECONCILE_PLAN_PRINT_LIMIT = int(os.getenv("RECONCILE_PLAN_PRINT_LIMIT", "50"))
+
+PLAN_ACTIONS = ["create", "update_persona", "update_config", "delete"]
+
+
+def agent_spec_hash(name: str, persona: str, config: dict) -> str:
+    """Hashes what defines an agent; equal hashes mean there is nothing to change."""
+    payload = json.dumps([name, persona, config], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def _current_config(record) -> dict:
+    # An agent whose server didn't report a handle is assumed to match rather than rewritten every run.
+    return {"model": record.model or AGENT_CONFIG["model"],
+            "embedding": record.embedding or AGENT_CONFIG["embedding"]}
+
+
+def plan_reconcile(personas, records: list, prune: bool = True) -> dict:
+    """
+    Diffs (agent_name, personality_description) pairs against AgentRecords and returns
+    the plan: 'create' holds (name, description) pairs, 'update_persona' (record, new
+    persona) pairs, 'update_config' and 'delete' records, and 'unchanged' a count.
+    With `prune` False, agents missing from the CSV are kept.
+    """
+    plan = {"create": [], "update_persona": [], "update_config": [], "delete": [], "unchanged": 0}
+    by_name = {}
+    for record in records:
+        if record.name in by_name:
+            # Only one agent per name can match a CSV row; extra copies are removed.
+            plan["delete"].append(record)
+        else:
+            by_name[record.name] = record
+
+    for agent_name, description in personas:
+        record = by_name.pop(agent_name, None)
+        if record is None:
+            plan["create"].append((agent_name, description))
+            continue
+        persona = render_persona(agent_name, description, agent_template_version(record))
+        current = _current_config(record)
+        desired_hash = agent_spec_hash(agent_name, persona, AGENT_CONFIG)
+        if desired_hash == agent_spec_hash(record.name, record.persona, current):
+            plan["unchanged"] += 1
+            continue
+        if persona != record.persona:
+            plan["update_persona"].append((record, persona))
+        if current != AGENT_CONFIG:
+            plan["update_config"].append(record)
+
+    if prune:
+        plan["delete"].extend(by_name.values())
+    return plan
+
+
+def _plan_names(plan: dict, action: str) -> list:
+    if action == "create":
+        return [agent_name for agent_name, _ in plan["create"]]
+    if action == "update_persona":
+        return [record.name for record, _ in plan["update_persona"]]
+    return [record.name for record in plan[action]]
+
+
+def plan_summary(plan: dict, limit: int = RECONCILE_PLAN_PRINT_LIMIT) -> dict:
+    """Counts and (up to `limit`) agent names per action, e.g. for a JSON response."""
+    # Each planned change is one write call; listing agents and registering tools are extra.
+    summary = {"unchanged": plan["unchanged"], "write_calls": sum(len(plan[action]) for action in PLAN_ACTIONS)}
+    for action in PLAN_ACTIONS:
+        summary[action] = {"count": len(plan[action]), "names": _plan_names(plan, action)[:limit]}
+    return summary
+
+
+def print_plan(plan: dict, limit: int = RECONCILE_PLAN_PRINT_LIMIT):
+    """Prints what a reconcile would do, one line per agent (up to `limit` per action)."""
+    symbols = {"create": "+", "update_persona": "~", "update_config": "~", "delete": "-"}
+    for action in PLAN_ACTIONS:
+        names = _plan_names(plan, action)
+        for name in names[:limit]:
+            print(f"  {symbols[action]} {action.replace('_', ' ')}: {name}")
+        if len(names) > limit:
+            print(f"  ... and {len(names) - limit} more to {action.replace('_', ' ')}")
+    print(f"Plan: {len(plan['create'])} to create, {len(plan['update_persona'])} persona updates, "
+          f"{len(plan['update_config'])} config updates, {len(plan['delete'])} to delete, "
+          f"{plan['unchanged']} unchanged.")
+
+
+async def apply_plan(plan: dict, max_concurrency: int = PROVISION_MAX_CONCURRENCY,
+                     rate_per_sec: float = PROVISION_RATE_PER_SEC) -> dict:
+    """
+    Carries out a plan from plan_reconcile. Updates and deletes run concurrently behind
+    the same adaptive rate limiter and retries as provisioning; creates go through
+    provision_agents. Keeps the agent registry in step. Returns per-action counts.
+    """
+    summary = {"created": 0, "updated_persona": 0, "updated_config": 0, "deleted": 0, "failed": 0}
+    bucket = AdaptiveTokenBucket(rate_per_sec)
+    semaphore = asyncio.Semaphore(max_concurrency)
+    start = time.perf_counter()
+
+    def on_retry(e, delay):
+        if get_status_code(e) == 429:
+            bucket.on_throttle()
+
+    async def run(counter: str, record, func, *args, registry_patch: dict = None, **kwargs):
+        """Makes one write call for `record`, then mirrors it in the registry."""
+        async with semaphore:
+            await bucket.acquire()
+            try:
+                await call_with_retry(func, *args, executor=EXECUTOR, retries=PROVISION_MAX_RETRIES,
+                                      on_retry=on_retry, **kwargs)
+                bucket.on_success()
+                if registry_patch is None:
+                    AGENT_REGISTRY.remove(record.id)
+                else:
+                    AGENT_REGISTRY.patch(record.id, **registry_patch)
+                summary[counter] += 1
+                print(f"  - {counter.replace('_', ' ').capitalize()} agent '{record.name}'")
+            except Exception as e:
+                summary["failed"] += 1
+                print(f"  - Error reconciling agent '{record.name}' ({counter}): {e}")
+
+    # 1. Deletes and in-place updates
+    client = get_client()
+    config = {"model": AGENT_CONFIG["model"], "embedding": AGENT_CONFIG["embedding"]}
+    calls = [run("deleted", record, client.agents.delete, record.id) for record in plan["delete"]]
+    calls += [run("updated_persona", record, client.agents.blocks.modify, record.id, "persona", value=persona,
+                  registry_patch={"persona": persona})
+              for record, persona in plan["update_persona"]]
+    calls += [run("updated_config", record, client.agents.modify, record.id, registry_patch=config, **config)
+              for record in plan["update_config"]]
+    await asyncio.gather(*calls)
+
+    # 2. New agents; the plan already excludes names that exist on the server
+    if plan["create"]:
+        tool_names = await asyncio.get_running_loop().run_in_executor(EXECUTOR, register_tools)
+        created = await provision_agents(plan["create"], tool_names, max_concurrency=max_concurrency,
+                                         rate_per_sec=rate_per_sec, existing_names=set())
+        summary["created"] = created["created"]
+        summary["failed"] += created["failed"]
+
+    elapsed = time.perf_counter() - start
+    print(f"Reconciled in {elapsed:.1f}s: {summary['created']} created, {summary['updated_persona']} persona "
+          f"updates, {summary['updated_config']} config updates, {summary['deleted']} deleted, "
+          f"{summary['failed']} failed.")
+    return summary
+
+
+async def reconcile_agents_from_csv(csv_file_like_object, dry_run: bool = False, prune: bool = True,
+                                    refresh: bool = True) -> dict:
+    """
+    Reconciles the server's agents with a persona CSV stream. With `dry_run`, only
+    prints and returns the plan. The server's agents are relisted into the agent
+    registry first, since a stale registry would plan creates for agents that already
+    exist; pass `refresh=False` only if the registry is known to be current. Raises
+    PersonaSchemaError if the CSV header is invalid, and ValueError rather than
+    pruning every agent if no row is valid.
+    """
+    print("--- Starting Agent Reconcile from CSV ---")
+
+    # 1. Check the header, then diff the rows against the registry as they stream in
+    personas = PersonaReader(csv_file_like_object)
+    loop = asyncio.get_running_loop()
+    records = await loop.run_in_executor(EXECUTOR, lambda: AGENT_REGISTRY.agents(refresh=refresh))
+    plan = plan_reconcile(personas, records, prune=prune)
+    personas.report.print_report()
+    if prune and not personas.report.valid and records:
+        raise ValueError("The persona CSV has no valid rows; refusing to delete every agent.")
+
+    # 2. Show the plan, and carry it out unless this is a dry run
+    print_plan(plan)
+    result = {"dry_run": dry_run, "plan": plan_summary(plan), "ingest": personas.report.summary()}
+    if not dry_run:
+        result["applied"] = await apply_plan(plan)
+    print("--- Agent Reconcile Complete ---")
+    return result
+
+
+def main(argv: list = None):
+    """Reconciles agents with a persona CSV (the bundled one by default)."""
+    parser = argparse.ArgumentParser(prog="python -m backend.main reconcile",
+                                     description="Create, update and delete agents to match a persona CSV.")
+    parser.add_argument("csv_path", nargs="?", default=PERSONALITIES_CSV, help="Persona CSV to reconcile with.")
+    parser.add_argument("--dry-run", action="store_true", help="Print the plan without changing anything.")
+    parser.add_argument("--keep-removed", action="store_true", help="Don't delete agents missing from the CSV.")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.csv_path):
+        print(f"Error: Personalities CSV not found at '{args.csv_path}'")
+        sys.exit(1)
+    try:
+        with open_persona_csv(args.csv_path) as infile:
+            asyncio.run(reconcile_agents_from_csv(infile, dry_run=args.dry_run, prune=not args.keep_removed))
+    except (PersonaSchemaError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
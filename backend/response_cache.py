@@ -0,0 +1,134 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from backend.prompts import persona_block_text
+
+# A persistent cache of parsed agent reactions, so re-running a simulation on an
+# unchanged ad doesn't pay for another LLM round trip per agent.
+# Entries expire after a TTL and the least recently used ones are evicted once the
+# cache grows past its size bound.
+
+RESPONSE_CACHE_PATH = os.getenv(
+    "RESPONSE_CACHE_PATH",
+    os.path.join(os.path.dirname(__file__), '..', 'data', 'response_cache.sqlite3'),
+)
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", str(24 * 60 * 60)))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "50000"))
+
+
+def normalize_ad_text(ad_text: str) -> str:
+    """Collapses whitespace so cosmetic edits don't miss the cache."""
+    return re.sub(r"\s+", " ", ad_text or "").strip()
+
+
+def persona_version(agent) -> str:
+    """
+    Returns a value that changes whenever the agent's persona changes.
+    Uses the persona block text when the agent (or its registry record) carries it, and
+    falls back to the creation timestamp (personas are set at creation time).
+    """
+    persona = persona_block_text(agent)
+    if persona is not None:
+        return hashlib.sha256(persona.encode()).hexdigest()
+    return str(getattr(agent, "created_at", "") or "")
+
+
+def make_cache_key(agent, ad_text: str, model_config: dict) -> str:
+    """Hashes agent id, persona version, model config and normalized ad text."""
+    payload = json.dumps(
+        [agent.id, persona_version(agent), model_config, normalize_ad_text(ad_text)],
+        sort_keys=True, default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResponseCache:
+    """A TTL + LRU bounded key/value store backed by SQLite."""
+
+    def __init__(self, path: str = RESPONSE_CACHE_PATH, ttl: float = RESPONSE_CACHE_TTL,
+                 max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._puts = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+            " created_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses(last_access)")
+        self._conn.commit()
+
+    def get_many(self, keys: list) -> dict:
+        """Returns {key: value} for every key with a live (non-expired) entry."""
+        if not keys:
+            return {}
+        now = time.time()
+        found = {}
+        with self._lock:
+            # SQLite limits the number of bound parameters, so look up in chunks.
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, value FROM responses WHERE key IN ({placeholders}) AND created_at >= ?",
+                    (*chunk, now - self.ttl),
+                ).fetchall()
+                found.update((key, json.loads(value)) for key, value in rows)
+            if found:
+                self._conn.executemany(
+                    "UPDATE responses SET last_access = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+                self._conn.commit()
+        return found
+
+    def get(self, key: str):
+        return self.get_many([key]).get(key)
+
+    def put(self, key: str, value):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now),
+            )
+            # Counting rows is a table scan, so only enforce the bounds every so often.
+            self._puts += 1
+            if self._puts % 64 == 1:
+                self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        """Drops expired entries, then the least recently used ones over the size bound."""
+        self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,))
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+        if count > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN"
+                " (SELECT key FROM responses ORDER BY last_access ASC LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+
+_CACHE = None
+
+
+def get_response_cache() -> ResponseCache:
+    """Returns the process-wide cache, opening it on first use."""
+    global _CACHE
+    if _CACHE is None:
+        _CACHE = ResponseCache()
+    return _CACHE
@@ -0,0 +1,107 @@
+import os
+import json
+import time
+import queue
+import atexit
+import threading
+
+# A buffered, append-only log of what agents did during simulations: every tool call,
+# every parsed reaction and the timings of every interaction (see metrics.py). Records are queued without blocking and written in
+# batches by a background thread to JSONL files (one JSON object per line), which are
+# flushed and fsync'ed after each batch so a crash loses at most one flush interval.
+
+RESULT_LOG_ENABLED = os.getenv("RESULT_LOG_ENABLED", "1") == "1"
+RESULT_LOG_DIR = os.getenv("RESULT_LOG_DIR", os.path.join(os.path.dirname(__file__), '..', 'data', 'logs'))
+RESULT_LOG_FLUSH_INTERVAL = float(os.getenv("RESULT_LOG_FLUSH_INTERVAL", "1.0"))
+RESULT_LOG_BATCH_SIZE = int(os.getenv("RESULT_LOG_BATCH_SIZE", "200"))
+
+INTERACTIONS_LOG = "simulation_interactions.jsonl"
+RESPONSES_LOG = "simulation_responses.jsonl"
+TIMINGS_LOG = "simulation_timings.jsonl"
+
+
+class ResultSink:
+    """Batches records on a background thread and appends them to JSONL files."""
+
+    def __init__(self, log_dir: str = RESULT_LOG_DIR, flush_interval: float = RESULT_LOG_FLUSH_INTERVAL,
+                 batch_size: int = RESULT_LOG_BATCH_SIZE):
+        self.log_dir = log_dir
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.written = 0
+        self._queue = queue.SimpleQueue()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="result-sink", daemon=True)
+        self._thread.start()
+
+    def record_tool_call(self, agent_id: str, agent_name: str, ad_id: str, tool_name: str, arguments):
+        self._queue.put((INTERACTIONS_LOG, {
+            "timestamp": time.time(),
+            "agent_id": agent_id,
+            "agent_name": agent_name,
+            "ad_id": ad_id,
+            "tool_called": tool_name,
+            "tool_arguments": arguments,
+        }))
+
+    def record_reaction(self, agent_id: str, agent_name: str, ad_id: str, reaction: dict):
+        self._queue.put((RESPONSES_LOG, dict(reaction, timestamp=time.time(), agent_id=agent_id,
+                                             agent_name=agent_name, ad_id=ad_id)))
+
+    def record_timing(self, agent_id: str, agent_name: str, timing: dict):
+        self._queue.put((TIMINGS_LOG, dict(timing, timestamp=time.time(), agent_id=agent_id,
+                                           agent_name=agent_name)))
+
+    def close(self):
+        """Flushes everything queued so far and stops the writer thread."""
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self):
+        os.makedirs(self.log_dir, exist_ok=True)
+        while True:
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=min(timeout, 0.1)))
+                except queue.Empty:
+                    if self._stopped.is_set():
+                        break
+            if batch:
+                self._write(batch)
+            if self._stopped.is_set() and self._queue.empty():
+                return
+
+    def _write(self, batch: list):
+        lines = {}
+        for file_name, record in batch:
+            lines.setdefault(file_name, []).append(json.dumps(record, default=str))
+        for file_name, records in lines.items():
+            try:
+                with open(os.path.join(self.log_dir, file_name), 'a', encoding='utf-8') as f:
+                    f.write("\n".join(records) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+                self.written += len(records)
+            except OSError as e:
+                print(f"Warning: Could not write {len(records)} records to '{file_name}': {e}")
+
+
+_SINK = None
+_SINK_LOCK = threading.Lock()
+
+
+def get_result_sink():
+    """Returns the process-wide sink, starting it on first use; None if logging is disabled."""
+    global _SINK
+    if not RESULT_LOG_ENABLED:
+        return None
+    with _SINK_LOCK:
+        if _SINK is None:
+            _SINK = ResultSink()
+            atexit.register(_SINK.close)
+    return _SINK
@@ -0,0 +1,336 @@
+import os
+import re
+import asyncio
+import math
+import zlib
+from collections import Counter
+from statistics import NormalDist
+import numpy as np
+from backend.analytics import DEFAULT_CONFIDENCE, REACTION_SCORES
+from backend.create_agents import PERSONALITIES_CSV
+from backend.persona_csv import read_persona_texts
+from backend.prompts import persona_block_text
+from backend.simulation import EXECUTOR, InteractionStats, load_agents, stream_simulation
+
+# Persona-cluster sampling: instead of presenting an ad to every agent, personas are
+# embedded, grouped with k-means, and a stratified random sample of each cluster is
+# simulated. Population reaction shares and the mean score are then estimated with the
+# stratified estimator, with standard errors (including the finite population
+# correction) and normal confidence intervals.
+# The sequential mode instead walks the whole population in random order and stops
+# as soon as the running estimates are precise enough.
+
+SAMPLE_SIZE = int(os.getenv("SAMPLE_SIZE", "300"))
+SAMPLE_CLUSTERS = int(os.getenv("SAMPLE_CLUSTERS", "20"))
+# Every sampled cluster gets at least this many representatives, so it has a variance.
+SAMPLE_MIN_PER_CLUSTER = int(os.getenv("SAMPLE_MIN_PER_CLUSTER", "2"))
+EMBEDDING_DIMS = int(os.getenv("EMBEDDING_DIMS", "512"))
+
+# Sequential (early-stopping) mode: stop once every reaction share's confidence interval
+# is at most EARLY_STOP_CI_WIDTH wide, checked after each wave of completed agents.
+EARLY_STOP_CI_WIDTH = float(os.getenv("EARLY_STOP_CI_WIDTH", "0.1"))
+EARLY_STOP_WAVE_SIZE = int(os.getenv("EARLY_STOP_WAVE_SIZE", "20"))
+EARLY_STOP_MIN_SAMPLES = int(os.getenv("EARLY_STOP_MIN_SAMPLES", "30"))
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "for", "from", "i", "i'm", "in", "is", "it",
+    "m", "me", "my", "of", "on", "or", "that", "the", "to", "with", "who", "am", "not", "just",
+}
+
+
+def load_persona_texts(csv_path: str = PERSONALITIES_CSV) -> dict:
+    """Maps agent_name -> personality_description from the personalities CSV."""
+    if not os.path.exists(csv_path):
+        return {}
+    return read_persona_texts(csv_path)
+
+
+def persona_text(agent, persona_texts: dict) -> str:
+    """The text a persona is clustered on: its CSV description, else its persona description, else its name."""
+    if agent.name in persona_texts:
+        return persona_texts[agent.name]
+    return getattr(agent, "description", None) or persona_block_text(agent) or agent.name or ""
+
+
+def embed_texts(texts: list, dims: int = EMBEDDING_DIMS) -> np.ndarray:
+    """
+    Embeds texts as L2-normalized TF-IDF vectors of unigrams and bigrams, hashed into
+    `dims` buckets (crc32, so embeddings are stable across processes).
+    """
+    rows, cols, weights = [], [], []
+    doc_freq = Counter()
+    for i, text in enumerate(texts):
+        words = [w for w in _WORD_RE.findall(text.lower()) if w not in _STOPWORDS]
+        features = Counter(zlib.crc32(term.encode()) % dims
+                           for term in words + [f"{a} {b}" for a, b in zip(words, words[1:])])
+        doc_freq.update(features.keys())
+        for bucket, count in features.items():
+            rows.append(i)
+            cols.append(bucket)
+            weights.append(1.0 + math.log(count))
+
+    vectors = np.zeros((len(texts), dims), dtype=np.float32)
+    if rows:
+        idf = np.zeros(dims)
+        for bucket, df in doc_freq.items():
+            idf[bucket] = math.log((1 + len(texts)) / (1 + df)) + 1.0
+        cols = np.array(cols)
+        vectors[np.array(rows), cols] = np.array(weights) * idf[cols]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1.0)
+
+
+def kmeans(vectors: np.ndarray, k: int, iterations: int = 25, seed: int = 0) -> np.ndarray:
+    """Clusters rows of `vectors` into k groups (k-means++ seeding); returns a label per row."""
+    n = len(vectors)
+    k = max(1, min(k, n))
+    rng = np.random.default_rng(seed)
+    centroids = [vectors[rng.integers(n)]]
+    closest = ((vectors - centroids[0]) ** 2).sum(axis=1)
+    for _ in range(1, k):
+        total = closest.sum()
+        index = rng.choice(n, p=closest / total) if total > 0 else rng.integers(n)
+        centroids.append(vectors[index])
+        closest = np.minimum(closest, ((vectors - vectors[index]) ** 2).sum(axis=1))
+    centroids = np.array(centroids)
+
+    labels = np.full(n, -1)
+    for _ in range(iterations):
+        # ||x - c||^2 up to a per-row constant, so the argmin is unchanged.
+        distances = (centroids ** 2).sum(axis=1) - 2 * vectors @ centroids.T
+        new_labels = distances.argmin(axis=1)
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        # Recompute all centroids with one matrix product; empty clusters keep theirs.
+        members = np.eye(k)[labels]
+        counts = members.sum(axis=0)
+        filled = counts > 0
+        centroids[filled] = (members.T @ vectors)[filled] / counts[filled, None]
+    return labels
+
+
+def allocate_sample(cluster_sizes: np.ndarray, sample_size: int,
+                    min_per_cluster: int = SAMPLE_MIN_PER_CLUSTER) -> np.ndarray:
+    """
+    Splits `sample_size` across clusters in proportion to their size (largest
+    remainders), with at least `min_per_cluster` each and never more than a cluster holds.
+    """
+    sizes = np.asarray(cluster_sizes, dtype=int)
+    floor = np.minimum(sizes, min_per_cluster)
+    if sample_size >= sizes.sum():
+        return sizes.copy()
+    if floor.sum() >= sample_size:
+        return floor
+    quota = sizes / sizes.sum() * sample_size
+    alloc = np.clip(np.floor(quota).astype(int), floor, sizes)
+    # Hand out what's left by largest remainder, then trim any overshoot from the floors.
+    remainder = quota - np.floor(quota)
+    for c in np.argsort(-remainder, kind="stable"):
+        if alloc.sum() >= sample_size:
+            break
+        if alloc[c] < sizes[c]:
+            alloc[c] += 1
+    while alloc.sum() < sample_size:
+        c = np.argmax(sizes - alloc)
+        alloc[c] += 1
+    while alloc.sum() > sample_size:
+        c = np.argmax(np.where(alloc > floor, alloc - quota, -np.inf))
+        alloc[c] -= 1
+    return alloc
+
+
+def stratified_sample(labels: np.ndarray, sample_size: int, seed: int = 0) -> np.ndarray:
+    """Returns the indices of a stratified random sample over cluster `labels`."""
+    rng = np.random.default_rng(seed)
+    sizes = np.bincount(labels)
+    alloc = allocate_sample(sizes, sample_size)
+    picked = [rng.choice(np.flatnonzero(labels == c), size=alloc[c], replace=False)
+              for c in range(len(sizes)) if alloc[c]]
+    return np.sort(np.concatenate(picked)) if picked else np.array([], dtype=int)
+
+
+def reaction_score(result: dict) -> float:
+    """Confidence-weighted score of one reaction (see analytics.REACTION_SCORES)."""
+    confidence = result.get("confidence")
+    confidence = DEFAULT_CONFIDENCE if confidence is None else float(confidence)
+    return REACTION_SCORES.get(result.get("reaction"), 0.0) * confidence / 100.0
+
+
+def stratified_estimate(labels: np.ndarray, results: dict, alpha: float = 0.05) -> dict:
+    """
+    Estimates population reaction shares and the mean score from sampled results.
+    `labels` holds the cluster of every persona in the population and `results`
+    maps a sampled persona's index to its reaction (None if the call failed).
+    Failed calls are treated as missing at random within their cluster; clusters
+    with no successful result are left out and the remaining weights renormalized.
+    """
+    sizes = np.bincount(labels).astype(float)
+    z = NormalDist().inv_cdf(1 - alpha / 2)
+    answered = {i: r for i, r in results.items() if r}
+    by_cluster = {}
+    for i, result in answered.items():
+        by_cluster.setdefault(labels[i], []).append(result)
+    covered = sorted(by_cluster)
+    weights = sizes[covered] / sizes[covered].sum() if covered else np.array([])
+
+    def estimate(values_per_cluster):
+        mean, variance = 0.0, 0.0
+        for weight, cluster, values in zip(weights, covered, values_per_cluster):
+            values = np.asarray(values, dtype=float)
+            n = len(values)
+            mean += float(weight * values.mean())
+            if n > 1:
+                fpc = 1 - n / sizes[cluster]
+                variance += float(weight ** 2 * values.var(ddof=1) / n * fpc)
+        se = math.sqrt(variance)
+        return {"estimate": mean, "std_error": se, "ci_low": mean - z * se, "ci_high": mean + z * se}
+
+    shares = {
+        reaction: estimate([[r.get("reaction") == reaction for r in by_cluster[c]] for c in covered])
+        for reaction in REACTION_SCORES
+    } if covered else {}
+    return {
+        "population": int(sizes.sum()),
+        "clusters": len(sizes),
+        "sampled": len(results),
+        "answered": len(answered),
+        "covered_population": int(sizes[covered].sum()) if covered else 0,
+        "reaction_shares": shares,
+        "score": estimate([[reaction_score(r) for r in by_cluster[c]] for c in covered]) if covered else None,
+    }
+
+
+def plan_sample(agents: list, sample_size: int = SAMPLE_SIZE, n_clusters: int = SAMPLE_CLUSTERS,
+                persona_texts: dict = None, seed: int = 0):
+    """Clusters `agents` by persona text and picks a stratified sample; returns (labels, sample indices)."""
+    if persona_texts is None:
+        persona_texts = load_persona_texts()
+    vectors = embed_texts([persona_text(agent, persona_texts) for agent in agents])
+    labels = kmeans(vectors, n_clusters, seed=seed)
+    # Relabel to 0..k-1 in case a cluster came out empty.
+    _, labels = np.unique(labels, return_inverse=True)
+    return labels, stratified_sample(labels, sample_size, seed=seed)
+
+
+async def run_sampled_simulation(ad_copy: str, sample_size: int = SAMPLE_SIZE, n_clusters: int = SAMPLE_CLUSTERS,
+                                 ad_id: str = "user_provided_ad", max_in_flight: int = None,
+                                 use_cache: bool = True, seed: int = 0) -> dict:
+    """
+    Presents the ad to a stratified sample of persona clusters and extrapolates
+    population-level reaction shares and score with confidence intervals.
+    Returns {"estimate": ..., "results": [...]}.
+    """
+    print(f"--- Starting Sampled Simulation for Ad: '{ad_id}' ---")
+
+    # 1. Cluster the population and pick representatives (CPU-bound, so off the event loop)
+    agents = await load_agents(refresh=not use_cache)
+    labels, sample = await asyncio.get_running_loop().run_in_executor(
+        EXECUTOR, lambda: plan_sample(agents, sample_size, n_clusters, seed=seed))
+    print(f"Found {len(agents)} agents in {labels.max() + 1} clusters. Sampling {len(sample)} of them...")
+
+    # 2. Simulate only the sampled agents
+    index_of = {agents[i].id: int(i) for i in sample}
+    results = {}
+    async for agent, _, result in stream_simulation([agents[i] for i in sample], [(ad_id, ad_copy)],
+                                                    max_in_flight=max_in_flight, use_cache=use_cache):
+        results[index_of[agent.id]] = result
+        if result:
+            result['cluster'] = int(labels[index_of[agent.id]])
+
+    # 3. Extrapolate to the whole population
+    estimate = stratified_estimate(labels, results)
+    estimate["calls_saved"] = len(agents) - len(sample)
+    score = estimate["score"]
+    print("\n--- Sampled Simulation Complete ---")
+    if score:
+        print(f"Estimated mean score {score['estimate']:.3f} "
+              f"(95% CI {score['ci_low']:.3f} to {score['ci_high']:.3f}) "
+              f"from {estimate['answered']} of {estimate['population']} agents.")
+    return {"estimate": estimate, "results": [r for r in results.values() if r]}
+
+
+def proportion_ci_width(successes: int, n: int, population: int, alpha: float = 0.05) -> float:
+    """
+    Full width of the Agresti-Coull interval for a proportion, with the finite
+    population correction. Unlike the plain normal interval it doesn't collapse to
+    zero width when no (or every) sampled agent chose a reaction.
+    """
+    if n <= 0:
+        return 1.0
+    z = NormalDist().inv_cdf(1 - alpha / 2)
+    n_adj = n + z ** 2
+    p_adj = (successes + z ** 2 / 2) / n_adj
+    fpc = (population - n) / (population - 1) if population > 1 else 0.0
+    return 2 * z * math.sqrt(p_adj * (1 - p_adj) / n_adj * max(fpc, 0.0))
+
+
+async def run_sequential_simulation(ad_copy: str, ci_width: float = EARLY_STOP_CI_WIDTH,
+                                    wave_size: int = EARLY_STOP_WAVE_SIZE, min_samples: int = EARLY_STOP_MIN_SAMPLES,
+                                    reactions: list = None, ad_id: str = "user_provided_ad",
+                                    max_in_flight: int = None, use_cache: bool = True, seed: int = 0,
+                                    alpha: float = 0.05) -> dict:
+    """
+    Presents the ad to agents in random order and stops once the share of each of
+    `reactions` (default: all of them) is known to within `ci_width`.
+    Stopping is only checked each time another `wave_size` agents at the front of the
+    random order have finished, and only those agents are used for the estimate, so
+    agents that answer quickly can't bias it. On stopping, pending interactions are
+    cancelled and in-flight streams are closed.
+    Returns {"estimate": ..., "results": [...]}.
+    """
+    print(f"--- Starting Sequential Simulation for Ad: '{ad_id}' ---")
+    agents = await load_agents(refresh=not use_cache)
+    population = len(agents)
+    reactions = reactions or list(REACTION_SCORES)
+    print(f"Found {population} agents. Stopping once every reaction share is within {ci_width:.2f}...")
+
+    # 1. Randomize the order agents are dispatched in
+    order = np.random.default_rng(seed).permutation(population)
+    shuffled = [agents[i] for i in order]
+    position = {agent.id: p for p, agent in enumerate(shuffled)}
+
+    # 2. Track the completed prefix of the random order and check it after each wave
+    done = {}
+    prefix, checked, widths, stopped = 0, 0, {}, False
+    stats = InteractionStats()
+    cells = stream_simulation(shuffled, [(ad_id, ad_copy)], max_in_flight=max_in_flight, use_cache=use_cache,
+                              stats=stats)
+    try:
+        async for agent, _, result in cells:
+            done[position[agent.id]] = result
+            while prefix in done:
+                prefix += 1
+            if prefix - checked < wave_size and prefix < population:
+                continue
+            checked = prefix
+            answered = [done[p] for p in range(prefix) if done[p]]
+            if len(answered) < min_samples:
+                continue
+            widths = {
+                reaction: proportion_ci_width(sum(r.get("reaction") == reaction for r in answered),
+                                              len(answered), population, alpha)
+                for reaction in reactions
+            }
+            print(f"  - {len(answered)} answers: widest CI {max(widths.values()):.3f}")
+            if max(widths.values()) <= ci_width and prefix < population:
+                stopped = True
+                break
+    finally:
+        # Closing the generator cancels pending cells and stops in-flight streams.
+        await cells.aclose()
+
+    # 3. Estimate from the completed prefix only
+    estimate = stratified_estimate(np.zeros(population, dtype=int),
+                                   {p: done[p] for p in range(prefix)}, alpha=alpha)
+    estimate.update({
+        "stopped_early": stopped,
+        "ci_widths": widths,
+        "completed": len(done),
+        # Cells that got a pool slot count as spent even if cancelled mid-stream; only the rest were saved.
+        "calls_saved": population - stats.started,
+    })
+    print("\n--- Sequential Simulation Complete ---")
+    print(f"Used {estimate['answered']} answers; {estimate['calls_saved']} of {population} calls saved.")
+    return {"estimate": estimate, "results": [r for r in done.values() if r]}
@@ -0,0 +1,259 @@
+import io
+import os
+import json
+import shutil
+import asyncio
+import tempfile
+from fastapi import FastAPI, File, HTTPException, UploadFile
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from backend.jobs import JOB_QUEUE, QueueFullError
+from backend.metrics import METRICS
+from backend.persona_csv import PersonaReader, PersonaSchemaError, open_persona_csv
+
+# The FastAPI app serves the frontend. Long-running work is queued as background jobs
+# (see jobs.py) so requests return immediately with a job id.
+app = FastAPI()
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+@app.get("/")
+def read_root():
+    return {"message": "Digital Clone Simulation Environment"}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Per-interaction latency, stream and parse metrics in the Prometheus text format."""
+    return PlainTextResponse(METRICS.render(), media_type="text/plain; version=0.0.4")
+
+def format_sse(event: str, data) -> str:
+    """Formats one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.get("/simulate/stream")
+async def simulate_stream(ad_copy: str, ad_id: str = "user_provided_ad", use_cache: bool = True):
+    """
+    Streams the simulation as Server-Sent Events: one `result` event per agent as soon
+    as it finishes (with running aggregate counts), then a final `done` event.
+    """
+    from backend.simulation import get_agents, stream_simulation
+
+    async def events():
+        try:
+            loop = asyncio.get_running_loop()
+            agents = await loop.run_in_executor(None, lambda: get_agents(refresh=not use_cache))
+        except Exception as e:
+            yield format_sse("error", {"detail": str(e)})
+            return
+        if not agents:
+            yield format_sse("error", {"detail": "No agents available for simulation."})
+            return
+
+        totals = {"total": len(agents), "completed": 0, "failed": 0, "reactions": {}}
+        yield format_sse("start", totals)
+        async for _, _, result in stream_simulation(agents, [(ad_id, ad_copy)], use_cache=use_cache):
+            totals["completed"] += 1
+            if result:
+                reaction = result.get("reaction", "unknown")
+                totals["reactions"][reaction] = totals["reactions"].get(reaction, 0) + 1
+            else:
+                totals["failed"] += 1
+            yield format_sse("result", {"result": result, "totals": totals})
+        yield format_sse("done", totals)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def submit_job(kind: str, func, *args) -> dict:
+    """Queues a background job, mapping a full queue to 503."""
+    try:
+        job = JOB_QUEUE.submit(kind, func, *args)
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return {"job_id": job.id, "status": job.status, "message": f"Job {job.id} queued."}
+
+async def simulation_job(job, ad_copy: str, ad_id: str, use_cache: bool, sample_size: int = 0,
+                         ci_width: float = 0):
+    """
+    Runs a simulation in the background, reporting per-agent progress on the job.
+    With a `sample_size`, only a stratified sample of persona clusters is simulated; with
+    a `ci_width`, agents are simulated in random order until every reaction share is
+    known to within that width. Either way the result is a population estimate (see
+    sampling.py) plus the reactions collected.
+    """
+    from backend.simulation import get_agents, stream_simulation
+
+    if sample_size > 0:
+        from backend.sampling import run_sampled_simulation
+        return await run_sampled_simulation(ad_copy, sample_size=sample_size, ad_id=ad_id, use_cache=use_cache)
+    if ci_width > 0:
+        from backend.sampling import run_sequential_simulation
+        return await run_sequential_simulation(ad_copy, ci_width=ci_width, ad_id=ad_id, use_cache=use_cache)
+
+    loop = asyncio.get_running_loop()
+    agents = await loop.run_in_executor(None, lambda: get_agents(refresh=not use_cache))
+    if not agents:
+        raise Exception("No agents available for simulation.")
+
+    job.progress = {"completed": 0, "total": len(agents)}
+    results = []
+    async for _, _, result in stream_simulation(agents, [(ad_id, ad_copy)], use_cache=use_cache):
+        job.progress["completed"] += 1
+        if result:
+            results.append(result)
+    return results
+
+async def batch_simulation_job(job, use_cache: bool):
+    """Runs every agent against every ad in data/ads in the background; the result maps ad_id to its reactions."""
+    from backend.simulation import load_ads_from_dir, load_agents, run_batch_simulation
+
+    ads = load_ads_from_dir()
+    if not ads:
+        raise Exception("No ads found in data/ads.")
+    agents = await load_agents(refresh=not use_cache)
+    job.progress = {"completed": 0, "total": len(agents) * len(ads)}
+    results = {ad_id: [] for ad_id, _ in ads}
+    async for _, ad_id, result in run_batch_simulation(ads, use_cache=use_cache, agents=agents):
+        job.progress["completed"] += 1
+        if result:
+            results[ad_id].append(result)
+    return results
+
+async def agents_job(job, action: str, csv_path: str, dry_run: bool = False):
+    """
+    Creates, reconciles, or deletes and recreates agents from an uploaded CSV in the
+    background. `csv_path` is the upload's temporary copy; the job streams it and deletes it.
+    """
+    from backend.create_agents import create_agents_from_csv, recreate_agents_from_csv
+
+    try:
+        with open_persona_csv(csv_path) as csv_file:
+            if action == "reconcile":
+                from backend.reconcile import reconcile_agents_from_csv
+                result = await reconcile_agents_from_csv(csv_file, dry_run=dry_run, refresh=True)
+                plan = result["plan"]
+                verb = "Would make" if dry_run else "Made"
+                result["message"] = (f"{verb} {plan['write_calls']} changes: {plan['create']['count']} creates, "
+                                     f"{plan['update_persona']['count']} persona updates, "
+                                     f"{plan['update_config']['count']} config updates, "
+                                     f"{plan['delete']['count']} deletes.")
+                return result
+            if action == "recreate":
+                created = await recreate_agents_from_csv(csv_file)
+            else:
+                created = await create_agents_from_csv(csv_file)
+    finally:
+        os.remove(csv_path)
+    return {"created": created, "message": f"Created {created} agents."}
+
+@app.post("/simulate")
+async def simulate(ad_copy: str, ad_id: str = "user_provided_ad", use_cache: bool = True, sample_size: int = 0,
+                   ci_width: float = 0):
+    """
+    Queues a simulation of `ad_copy` against every agent, against a stratified sample
+    of `sample_size` agents, or until reaction shares are within `ci_width`, and
+    returns its job id.
+    """
+    return submit_job("simulate", simulation_job, ad_copy, ad_id, use_cache, sample_size, ci_width)
+
+@app.post("/simulate/batch")
+async def simulate_batch(use_cache: bool = True):
+    """Queues a simulation of every ad in data/ads against every agent and returns its job id."""
+    return submit_job("simulate_batch", batch_simulation_job, use_cache)
+
+def spool_persona_csv(upload) -> str:
+    """
+    Checks the header of an uploaded persona CSV (a binary file object), then copies
+    it to a temporary file and returns its path. The upload is closed once the request
+    ends, so the background job reads the copy instead; nothing is decoded up front
+    beyond the header, and rows that turn out not to be UTF-8 are reported as bad rows.
+    """
+    upload.seek(0)
+    text = io.TextIOWrapper(upload, encoding="utf-8-sig", errors="replace", newline="")
+    try:
+        PersonaReader(text)
+    finally:
+        # Leave the upload open for the copy below.
+        text.detach()
+    upload.seek(0)
+    with tempfile.NamedTemporaryFile(mode="wb", prefix="personas_", suffix=".csv", delete=False) as copy:
+        shutil.copyfileobj(upload, copy)
+    return copy.name
+
+@app.post("/agents/{action}")
+async def manage_agents(action: str, file: UploadFile = File(...), dry_run: bool = False):
+    """
+    Queues agent provisioning from an uploaded persona CSV. `action` is 'add',
+    'reconcile' (only create, update and delete what differs; `dry_run` returns the
+    plan without applying it) or 'recreate' (delete everything and start over).
+    """
+    if action not in ("add", "reconcile", "recreate"):
+        raise HTTPException(status_code=404, detail=f"Unknown agent action '{action}'.")
+    # Reject a bad header now rather than in the background job; rows are validated as they stream.
+    try:
+        csv_path = await asyncio.get_running_loop().run_in_executor(None, spool_persona_csv, file.file)
+    except PersonaSchemaError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        return submit_job(f"agents_{action}", agents_job, action, csv_path, dry_run)
+    except HTTPException:
+        os.remove(csv_path)
+        raise
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """Returns the status, progress and (once finished) the result of a job."""
+    job = JOB_QUEUE.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found.")
+    return job.to_dict()
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """Streams a job's status as Server-Sent Events until it finishes."""
+    job = JOB_QUEUE.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found.")
+
+    async def events():
+        while not job.finished.is_set():
+            yield format_sse("status", {k: v for k, v in job.to_dict().items() if k != "result"})
+            try:
+                await asyncio.wait_for(job.finished.wait(), timeout=1.0)
+            except asyncio.TimeoutError:
+                pass
+        yield format_sse("done", job.to_dict())
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/analytics")
+async def get_analytics(by: str = "ad", n_boot: int = 500):
+    """
+    Aggregates logged simulation results per 'ad', 'persona' or 'tag': reaction shares,
+    mean confidence and a bootstrap CI for the confidence-weighted score.
+    """
+    # Imported lazily: numpy/pandas are only needed for this endpoint.
+    from backend import analytics
+    from backend.result_sink import RESULT_LOG_DIR, RESPONSES_LOG
+    if by not in analytics.GROUP_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"'by' must be one of {', '.join(analytics.GROUP_COLUMNS)}.")
+    source = os.path.join(RESULT_LOG_DIR, RESPONSES_LOG)
+    if not os.path.exists(source):
+        source = analytics.DATA_DIR
+
+    def compute():
+        summary = analytics.aggregate(analytics.load_results(source), by=by, n_boot=n_boot)
+        return json.loads(summary.to_json(orient="records"))
+
+    try:
+        groups = await asyncio.get_running_loop().run_in_executor(None, compute)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="No simulation results have been logged yet.")
+    return {"by": by, "groups": groups}
@@ -4,17 +4,108 @@ import time
 import asyncio
 import json
 import re
-from letta_client import Letta, MessageCreate
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from backend.agent_memory import after_interaction
+from backend.agent_registry import AGENT_REGISTRY
+from backend.client import get_client
+from backend.create_agents import AGENT_CONFIG
+from backend.metrics import InteractionTrace, get_logger
+from backend.prompts import PROMPT_USAGE, agent_template_version, render_ad_message
+from backend.response_cache import get_response_cache, make_cache_key
+from backend.result_sink import get_result_sink
+from backend.stream_guard import StreamGuard, consume_stream
+from backend.reaction_parser import (
+    IncrementalJSONExtractor, derive_reaction_from_tool_calls, extract_reaction, has_required_fields,
+    validate_reaction,
+)
 
 # Load environment variables from .env file
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '..', '.env'))
 
+log = get_logger(__name__)
+
 # --- Configuration ---
-api_key = os.getenv("LETTA_API_KEY")
-if not api_key:
-    raise ValueError("LETTA_API_KEY not found in .env file.")
-CLIENT = Letta(token=api_key)
+# The Letta client is created lazily and shared with create_agents (see client.py).
+
+# The Letta client is synchronous, so every agent stream is consumed on a worker thread.
+# This caps how many agent interactions are in flight at once across the whole process.
+SIMULATION_MAX_IN_FLIGHT = int(os.getenv("SIMULATION_MAX_IN_FLIGHT", "32"))
+EXECUTOR = ThreadPoolExecutor(max_workers=SIMULATION_MAX_IN_FLIGHT, thread_name_prefix="agent-stream")
+# Response cache reads and writes are SQLite calls (each write is fsynced), so they run on
+# their own thread: off the event loop, and never waiting behind agent streams for a slot.
+CACHE_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="response-cache")
+
+# When an agent acts through tools but returns no JSON, "derive" builds its reaction from
+# the tool calls and only sends a follow-up request if a required field is missing;
+# "always" keeps the old behaviour of asking for the JSON in a second round trip.
+FOLLOW_UP_MODE = os.getenv("SIMULATION_FOLLOW_UP_MODE", "derive")
+REQUIRED_REACTION_FIELDS = [
+    field.strip() for field in os.getenv("SIMULATION_REQUIRED_FIELDS", "reaction").split(",") if field.strip()
+]
+FOLLOW_UP_PROMPT = "Please provide your JSON analysis now as required in the format: {\"reaction\": \"action\", \"confidence\": 0-100, \"reasoning\": \"explanation\", \"tags\": [\"tag1\", \"tag2\"], \"final_message\": \"your post\"}"
+
+# Returned as the description of agents whose persona block isn't available.
+UNKNOWN_DESCRIPTION = "Persona description not available."
+
+ADS_DIR = os.path.join(os.path.dirname(__file__), '..', 'data', 'ads')
+
+def get_agents(refresh: bool = False):
+    """Returns the agents from the agent registry, which lists them only when first needed or stale."""
+    return AGENT_REGISTRY.agents(refresh=refresh)
+
+class InteractionStats:
+    """Thread-safe per-run counters for how agent reactions were obtained."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Interactions that got a pool slot, counted as they start (unlike `interactions`).
+        self.started = 0
+        self.interactions = 0
+        self.primary_seconds = 0.0
+        self.derived = 0
+        self.follow_ups = 0
+        self.follow_up_seconds = 0.0
+
+    def record_started(self):
+        with self._lock:
+            self.started += 1
+
+    def record_interaction(self, seconds: float):
+        with self._lock:
+            self.interactions += 1
+            self.primary_seconds += seconds
+
+    def record_derived(self):
+        with self._lock:
+            self.derived += 1
+
+    def record_follow_up(self, seconds: float):
+        with self._lock:
+            self.follow_ups += 1
+            self.follow_up_seconds += seconds
+
+    def summary(self) -> dict:
+        """
+        Returns the follow-up fallback rate and the estimated time saved by deriving
+        reactions. Each derived reaction is assumed to save one average follow-up call
+        (or one average primary call, if no follow-ups happened this run).
+        """
+        needed = self.derived + self.follow_ups
+        if self.follow_ups:
+            per_call = self.follow_up_seconds / self.follow_ups
+        else:
+            per_call = self.primary_seconds / self.interactions if self.interactions else 0.0
+        return {
+            "interactions": self.interactions,
+            "needed_json_recovery": needed,
+            "derived": self.derived,
+            "follow_ups": self.follow_ups,
+            "fallback_rate": self.follow_ups / needed if needed else 0.0,
+            "estimated_seconds_saved": self.derived * per_call,
+        }
 
 def extract_json_from_string(text: str) -> dict:
     """
@@ -22,8 +113,14 @@ def extract_json_from_string(text: str) -> dict:
     Handles cases where the JSON is embedded in other text.
     """
     if not text or not text.strip():
-        print(f"Warning: Empty or whitespace-only response received")
+        log.debug("Empty or whitespace-only response received")
         return None
+
+    # Prefer the first brace-balanced object that validates as a reaction; this copes
+    # with responses that contain several objects.
+    reaction = extract_reaction(text)
+    if reaction is not None:
+        return reaction
     
     # Try to find JSON object enclosed in curly braces
     # Look for the first { and the last } to handle nested objects
@@ -31,46 +128,146 @@ def extract_json_from_string(text: str) -> dict:
     end_idx = text.rfind('}')
     
     if start_idx == -1 or end_idx == -1 or start_idx >= end_idx:
-        print(f"Warning: No valid JSON structure found in text: '{text[:100]}...'")
+        log.debug("No valid JSON structure found in text: %r", text[:100])
         return None
     
     json_str = text[start_idx:end_idx + 1]
     
     try:
-        return json.loads(json_str)
+        parsed = json.loads(json_str)
     except json.JSONDecodeError as e:
-        print(f"Warning: Could not decode JSON from string: '{json_str[:100]}...', Error: {e}")
+        log.debug("Could not decode JSON from string: %r, error: %s", json_str[:100], e)
         
         # Try to clean up common issues
         # Remove any trailing commas before closing braces/brackets
         cleaned = re.sub(r',(\s*[}\]])', r'\1', json_str)
         try:
-            return json.loads(cleaned)
+            parsed = json.loads(cleaned)
         except json.JSONDecodeError:
-            print(f"Warning: Even cleaned JSON failed to parse: '{cleaned[:100]}...'")
+            log.debug("Even cleaned JSON failed to parse: %r", cleaned[:100])
             return None
 
-async def run_simulation_with_ad_copy(ad_copy: str):
-    """Runs the simulation for all agents against a single ad, returning JSON results."""
-    ad_id = "user_provided_ad"
-    print(f"--- Starting Simulation for Ad: '{ad_id}' ---")
+    # The span may parse without being a reaction (an unknown reaction, confidence out of range...).
+    reaction = validate_reaction(parsed)
+    if reaction is None:
+        log.debug("Parsed JSON is not a valid reaction: %r", json_str[:100])
+    return reaction
 
-    # 1. Get all available agents
+async def load_agents(refresh: bool = False):
+    """Fetches the agents to simulate without blocking the event loop, raising if there are none."""
     try:
-        agents = CLIENT.agents.list()
+        agents = await asyncio.get_running_loop().run_in_executor(EXECUTOR, lambda: get_agents(refresh=refresh))
         if not agents:
             print("No agents found. Please create them first.")
             raise Exception("No agents available for simulation.")
-        
+        return agents
     except Exception as e:
         print(f"Failed to connect to Letta server or fetch agent details. Error: {e}")
         raise e
 
+def load_ads_from_dir(ads_dir: str = ADS_DIR):
+    """Returns (ad_id, ad_copy) pairs for every .txt file in `ads_dir`, keyed by file name."""
+    ads = []
+    for file_name in sorted(os.listdir(ads_dir)):
+        if file_name.endswith(".txt"):
+            with open(os.path.join(ads_dir, file_name), 'r', encoding='utf-8') as f:
+                ads.append((os.path.splitext(file_name)[0], f.read()))
+    return ads
+
+async def stream_simulation(agents, ads, max_in_flight: int = None, use_cache: bool = True,
+                            stats: InteractionStats = None):
+    """
+    Schedules the agents x ads matrix through one bounded worker pool and yields
+    (agent, ad_id, result) as each cell finishes; result is None for failed cells.
+    Each agent handles one ad at a time so its memory is never hit concurrently.
+    Reactions are served from the response cache unless `use_cache` is False; fresh
+    reactions are always written back to it. Pass `stats` to read the run's
+    counters, e.g. how many calls were started before the consumer stopped.
+    """
+    # 1. Serve unchanged (agent, ad) pairs from the response cache
+    loop = asyncio.get_running_loop()
+    cache = await loop.run_in_executor(CACHE_EXECUTOR, get_response_cache)
+    keys = {
+        (agent.id, ad_id): make_cache_key(agent, ad_copy, dict(AGENT_CONFIG, prompt_template=agent_template_version(agent)))
+        for ad_id, ad_copy in ads for agent in agents
+    }
+    cached = await loop.run_in_executor(CACHE_EXECUTOR, cache.get_many, list(keys.values())) if use_cache else {}
+    if cached:
+        print(f"Using {len(cached)} cached results.")
+
+    # 2. Run the remaining cells, bounded by max_in_flight and serialized per agent
+    semaphore = asyncio.Semaphore(max_in_flight or SIMULATION_MAX_IN_FLIGHT)
+    stats = stats or InteractionStats()
+    # Set when the consumer stops early, so interactions already streaming stop too.
+    cancelled = threading.Event()
+    agent_locks = {agent.id: asyncio.Lock() for agent in agents}
+
+    async def run_cell(agent, ad_id, ad_copy):
+        key = keys[(agent.id, ad_id)]
+        if key in cached:
+            result = dict(cached[key])
+        else:
+            queued_at = time.perf_counter()
+            # Take the agent's lock before a pool slot so waiting never holds a slot.
+            async with agent_locks[agent.id]:
+                async with semaphore:
+                    stats.record_started()
+                    result = await run_agent_interaction(agent, ad_id, ad_copy, stats, cancelled, queued_at)
+            if result:
+                await loop.run_in_executor(CACHE_EXECUTOR, cache.put, key, result)
+        if result:
+            result['ad_id'] = ad_id
+        return agent, ad_id, result
+
+    # Ad-major order spreads consecutive cells across different agents.
+    tasks = [asyncio.ensure_future(run_cell(agent, ad_id, ad_copy)) for ad_id, ad_copy in ads for agent in agents]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+        summary = stats.summary()
+        if summary["needed_json_recovery"]:
+            print(f"JSON recovery: {summary['derived']} derived from tool calls, {summary['follow_ups']} follow-up calls "
+                  f"(fallback rate {summary['fallback_rate']:.0%}, ~{summary['estimated_seconds_saved']:.1f}s saved).")
+        for version, usage in PROMPT_USAGE.summary().items():
+            print(f"Prompt template {version}: {usage['calls']} ad messages sent so far, "
+                  f"~{usage['avg_message_tokens']:.0f} tokens each.")
+    finally:
+        # If the consumer stops early, don't leave cells running in the background.
+        cancelled.set()
+        for task in tasks:
+            task.cancel()
+
+async def run_batch_simulation(ads, max_in_flight: int = None, use_cache: bool = True, agents: list = None):
+    """
+    Runs every agent (or just `agents`, if given) against every (ad_id, ad_copy) pair,
+    listing agents only once. Yields (agent, ad_id, result) as each cell finishes; see
+    stream_simulation.
+    """
+    print(f"--- Starting Batch Simulation for {len(ads)} Ads ---")
+    if agents is None:
+        agents = await load_agents(refresh=not use_cache)
+    print(f"Found {len(agents)} agents. Scheduling {len(agents) * len(ads)} interactions...")
+    async for cell in stream_simulation(agents, ads, max_in_flight=max_in_flight, use_cache=use_cache):
+        yield cell
+    print("\n--- Batch Simulation Complete ---")
+
+async def run_simulation_with_ad_copy(ad_copy: str, max_in_flight: int = None, use_cache: bool = True,
+                                      ad_id: str = "user_provided_ad"):
+    """
+    Runs the simulation for all agents against a single ad, returning JSON results.
+    At most `max_in_flight` agents (default SIMULATION_MAX_IN_FLIGHT) are streamed concurrently.
+    Reactions are served from the response cache unless `use_cache` is False.
+    """
+    print(f"--- Starting Simulation for Ad: '{ad_id}' ---")
+
+    # 1. Get all available agents
+    agents = await load_agents(refresh=not use_cache)
+
     print(f"Found {len(agents)} agents. Presenting ad and collecting results...")
 
     # 2. Present the ad to each agent concurrently
-    tasks = [run_agent_interaction(agent, ad_id, ad_copy) for agent in agents]
-    results = await asyncio.gather(*tasks)
+    results = [result async for _, _, result in stream_simulation(
+        agents, [(ad_id, ad_copy)], max_in_flight=max_in_flight, use_cache=use_cache)]
 
     # Filter out any None results from failed interactions
     successful_results = [res for res in results if res]
@@ -79,110 +276,168 @@ async def run_simulation_with_ad_copy(ad_copy: str):
     print(f"Successfully collected {len(successful_results)} results.")
     return successful_results
 
-async def run_agent_interaction(agent, ad_id: str, ad_content: str):
-    """Presents an ad to a single agent and processes its response."""
-    print(f"\n-> Presenting ad to agent: {agent.name} ({agent.id})")
-
-    prompt = f"""
-You are on a social media platform and you see the following ad.
-Your name is {agent.name}. Your personality is stored in your 'persona' memory block.
-
-Ad Content: "{ad_content}"
-
-You must complete this task in TWO PHASES:
-
-PHASE 1 - TAKE ACTIONS:
-Based on your persona, use the provided tools to react to this ad. You can use one or more tools (e.g., like and comment).
-
-PHASE 2 - PROVIDE ANALYSIS (MANDATORY):
-After your tool calls, you MUST immediately provide a JSON analysis of your reaction.
-
-Your JSON response must be a single line with no other text, starting with {{{{ and ending with }}}}.
-
-**If you took multiple actions, for the "reaction" field in the JSON, choose the one that you feel is your PRIMARY reaction.** For example, if you liked and commented, and the comment is more significant, use "comment".
+async def run_agent_interaction(agent, ad_id: str, ad_content: str, stats: InteractionStats = None,
+                                cancel_event: threading.Event = None, queued_at: float = None):
+    """
+    Presents an ad to a single agent and processes its response.
+    The blocking Letta stream is consumed on EXECUTOR so the event loop stays free;
+    setting `cancel_event` closes the stream at the next chunk and discards the result.
+    `queued_at` (a time.perf_counter() value) is when the interaction was scheduled,
+    for the queue-wait metric.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(EXECUTOR, _run_agent_interaction_sync, agent, ad_id, ad_content, stats,
+                                      cancel_event, queued_at)
 
-Required format:
-{{"reaction": "primary_action", "confidence": 0-100, "reasoning": "why you reacted this way", "tags": ["keyword1", "keyword2"], "final_message": "your social media post"}}
+def _run_agent_interaction_sync(agent, ad_id: str, ad_content: str, stats: InteractionStats = None,
+                                cancel_event: threading.Event = None, queued_at: float = None):
+    """Synchronous body of run_agent_interaction; runs on a worker thread."""
+    trace = InteractionTrace(agent.id, ad_id, queued_at)
+    trace.start()
+    outcome = "error"
+    try:
+        result, outcome = _interact(agent, ad_id, ad_content, stats, cancel_event, trace)
+        return result
+    finally:
+        timing = trace.finish(outcome)
+        sink = get_result_sink()
+        if sink:
+            sink.record_timing(agent.id, agent.name, timing)
 
-The `reaction` value should be one of `like`, `dislike`, `comment`, `repost`, or `ignore`.
+def _interact(agent, ad_id: str, ad_content: str, stats: InteractionStats, cancel_event: threading.Event,
+              trace: InteractionTrace):
+    """Streams the ad to the agent and parses its reaction; returns (reaction or None, outcome)."""
+    # Deferred so importing this module doesn't pull in letta_client.
+    from letta_client import MessageCreate
 
-IMPORTANT: You MUST complete both phases. Do not stop after phase 1.
+    log.debug("Presenting ad to agent: %s (%s)", agent.name, agent.id)
 
-Example complete interaction:
-1. [Agent uses tool: agent_like_ad]
-2. [Agent uses tool: agent_comment_ad]
-3. {{"reaction": "comment", "confidence": 90, "reasoning": "I liked it, but my main action is commenting to ask for more details.", "tags": ["eco", "fashion"], "final_message": "Love it! Can you provide more info on your ethical sourcing?"}}
-"""
+    # Static instructions live in the agent's persona; only the ad is sent per call.
+    template_version, prompt = render_ad_message(agent, ad_id, ad_content)
+    PROMPT_USAGE.record(template_version, prompt)
     try:
         # Send the prompt to the agent
-        print(f"  - Sending prompt to {agent.name}...")
-        response = CLIENT.agents.messages.create_stream(
+        start = time.perf_counter()
+        trace.stream_started()
+        response = get_client().agents.messages.create_stream(
             agent_id=agent.id,
             messages=[MessageCreate(role="user", content=prompt)],
         )
         
-        # Track tool calls and content
+        # Track tool calls (name, arguments) and content; the guard cuts off runaway generations
         tool_calls = []
-        response_content = ""
-        
-        for chunk in response:
-            if chunk.message_type == "assistant_message" and chunk.content:
-                response_content += chunk.content
-            elif chunk.message_type == "tool_call_message":
+        guard = StreamGuard(cancel_event=cancel_event)
+        extractor = IncrementalJSONExtractor()
+        sink = get_result_sink()
+
+        def record_tool_call(chunk):
+            trace.on_chunk(chunk)
+            if chunk.message_type == "tool_call_message":
                 tool_name = chunk.tool_call.name
-                tool_calls.append(tool_name)
-                print(f"  - Tool Call by {agent.name}: {tool_name}")
-        
-        print(f"  - Tool calls made: {tool_calls}")
-        print(f"  - Raw response from {agent.name} (length: {len(response_content)}): '{response_content}'")
-        
-        # If we got an empty response but tool calls were made, try to get a follow-up
-        if not response_content.strip() and tool_calls:
-            print(f"  - Agent {agent.name} made tool calls but gave empty response. Requesting JSON...")
-            follow_up_stream = CLIENT.agents.messages.create_stream(
-                agent_id=agent.id,
-                messages=[MessageCreate(role="user", content="Please provide your JSON analysis now as required in the format: {\"reaction\": \"action\", \"confidence\": 0-100, \"reasoning\": \"explanation\", \"tags\": [\"tag1\", \"tag2\"], \"final_message\": \"your post\"}")],
-            )
-            follow_up_content = ""
-            for chunk in follow_up_stream:
-                if chunk.message_type == "assistant_message" and chunk.content:
-                    follow_up_content += chunk.content
-            response_content = follow_up_content
-            print(f"  - Follow-up response from {agent.name} (length: {len(response_content)}): '{response_content}'")
-        
-        if not response_content.strip():
-            print("Warning: Empty or whitespace-only response received")
-            return None
+                tool_calls.append((tool_name, chunk.tool_call.arguments))
+                if sink:
+                    sink.record_tool_call(agent.id, agent.name, ad_id, tool_name, chunk.tool_call.arguments)
+                log.debug("Tool call by %s: %s", agent.name, tool_name)
+
+        tripped = consume_stream(response, guard, on_chunk=record_tool_call, extractor=extractor)
+        trace.stream_finished()
+        if stats:
+            stats.record_interaction(time.perf_counter() - start)
+        if tripped == "cancelled":
+            log.debug("Interaction with %s cancelled.", agent.name)
+            return None, "cancelled"
+        if tripped:
+            log.warning("Stream guard stopped %s's response early (%s).", agent.name, tripped)
+        response_content = guard.loop_free_text()
         
-        # Extract the JSON from the agent's final response
-        json_response = extract_json_from_string(response_content)
+        log.debug("Raw response from %s (tool calls %s, length %d): %r", agent.name,
+                  [name for name, _ in tool_calls], len(response_content), response_content)
         
+        # Use the reaction found while streaming, else extract it from the full response
+        json_response = extractor.result
+        if json_response is None and response_content.strip():
+            json_response = extract_json_from_string(response_content)
+
+        # No usable JSON, but the agent did act: derive the reaction from its tool calls,
+        # and only ask again when a required field can't be derived.
+        if not json_response and tool_calls and tripped != "deadline":
+            derived = derive_reaction_from_tool_calls(tool_calls)
+            if FOLLOW_UP_MODE == "derive" and has_required_fields(derived, REQUIRED_REACTION_FIELDS):
+                log.debug("Derived %s's reaction from its tool calls: %s", agent.name, derived['reaction'])
+                json_response = derived
+                if stats:
+                    stats.record_derived()
+            else:
+                log.debug("Agent %s made tool calls but gave no JSON. Requesting JSON...", agent.name)
+                follow_up_start = time.perf_counter()
+                trace.follow_up = True
+                trace.stream_started()
+                follow_up_stream = get_client().agents.messages.create_stream(
+                    agent_id=agent.id,
+                    messages=[MessageCreate(role="user", content=FOLLOW_UP_PROMPT)],
+                )
+                follow_up_guard = StreamGuard(cancel_event=cancel_event)
+                extractor = IncrementalJSONExtractor()
+                tripped = consume_stream(follow_up_stream, follow_up_guard, on_chunk=trace.on_chunk,
+                                         extractor=extractor)
+                trace.stream_finished()
+                if stats:
+                    stats.record_follow_up(time.perf_counter() - follow_up_start)
+                if tripped == "cancelled":
+                    log.debug("Interaction with %s cancelled.", agent.name)
+                    return None, "cancelled"
+                if tripped:
+                    log.warning("Stream guard stopped %s's follow-up early (%s).", agent.name, tripped)
+                response_content = follow_up_guard.loop_free_text()
+                log.debug("Follow-up response from %s (length %d): %r", agent.name, len(response_content),
+                          response_content)
+                json_response = extractor.result or extract_json_from_string(response_content)
+
         if json_response:
             # Add agent info to the response
             json_response['agent_id'] = agent.id
             json_response['agent_name'] = agent.name
-            # FIX: The agent object from list() doesn't contain memory_blocks.
-            # We will return a placeholder for now.
-            json_response['description'] = "Persona description (details not available from list view)."
-            return json_response
+            # Registry records carry the persona text, so this costs no extra call.
+            json_response['description'] = getattr(agent, "description", None) or UNKNOWN_DESCRIPTION
+            if sink:
+                sink.record_reaction(agent.id, agent.name, ad_id, json_response)
+            after_interaction(agent, ad_id, json_response)
+            return json_response, "ok"
         else:
-            print(f"  - Error: Could not parse JSON response from agent '{agent.name}'")
-            return None
+            log.warning("Could not parse JSON response from agent '%s'", agent.name)
+            after_interaction(agent, ad_id, None)
+            return None, "parse_failure"
 
     except Exception as e:
-        print(f"  - Error interacting with agent '{agent.name}': {e}")
-        return None
+        log.warning("Error interacting with agent '%s': %s", agent.name, e)
+        return None, "error"
+
+async def _run_ads_dir(ads_dir: str, max_in_flight: int, use_cache: bool):
+    ads = load_ads_from_dir(ads_dir)
+    if not ads:
+        print(f"No .txt ads found in '{ads_dir}'.")
+        return
+    reactions = {ad_id: {} for ad_id, _ in ads}
+    async for _, ad_id, result in run_batch_simulation(ads, max_in_flight=max_in_flight, use_cache=use_cache):
+        reaction = result.get("reaction", "unknown") if result else "failed"
+        reactions[ad_id][reaction] = reactions[ad_id].get(reaction, 0) + 1
+    for ad_id, counts in reactions.items():
+        print(f"  {ad_id}: " + ", ".join(f"{reaction} {count}" for reaction, count in sorted(counts.items())))
+
+def main(argv: list = None):
+    """Runs every agent against every ad in a directory of .txt ads (data/ads by default)."""
+    parser = argparse.ArgumentParser(prog="python -m backend.main simulate",
+                                     description="Present every .txt ad in a directory to every agent.")
+    parser.add_argument("ads_dir", nargs="?", default=ADS_DIR, help="Directory of ads, one .txt file per ad.")
+    parser.add_argument("--max-in-flight", type=int, default=None, help="Concurrent agent interactions.")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Ask every agent again instead of reusing cached reactions.")
+    args = parser.parse_args(argv)
 
-def main():
-    """Main function to select an ad and run the simulation."""
-    # This main function is now for local testing purposes only
-    print("This script is now intended to be run as part of the FastAPI server.")
-    print("To test locally, you can call run_simulation_with_ad_copy directly.")
-    # Example usage:
-    # ad_file = os.path.join(os.path.dirname(__file__), '..', 'data', 'ads', 'sample_ad.txt')
-    # with open(ad_file, 'r') as f:
-    #     sample_ad = f.read()
-    # asyncio.run(run_simulation_with_ad_copy(sample_ad))
+    if not os.path.isdir(args.ads_dir):
+        print(f"Error: Ads directory not found at '{args.ads_dir}'")
+        sys.exit(1)
+    asyncio.run(_run_ads_dir(args.ads_dir, args.max_in_flight, not args.no_cache))
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,129 @@
+import os
+import re
+import time
+
+# Guards an agent's response stream against runaway generations: an output budget,
+# repeated n-gram loops (e.g. thousands of "!" tokens) and a wall-clock deadline.
+# Chunks are collected in a list and joined once, instead of concatenating per chunk.
+
+STREAM_MAX_CHARS = int(os.getenv("STREAM_MAX_CHARS", "8000"))
+STREAM_MAX_TOKENS = int(os.getenv("STREAM_MAX_TOKENS", "2000"))
+STREAM_DEADLINE_SECONDS = float(os.getenv("STREAM_DEADLINE_SECONDS", "120"))
+# A loop is any n-gram (n <= STREAM_LOOP_MAX_NGRAM) repeated STREAM_LOOP_MIN_REPEATS times in a row.
+STREAM_LOOP_MAX_NGRAM = int(os.getenv("STREAM_LOOP_MAX_NGRAM", "4"))
+STREAM_LOOP_MIN_REPEATS = int(os.getenv("STREAM_LOOP_MIN_REPEATS", "12"))
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+
+class StreamGuard:
+    """
+    Accumulates streamed text and decides when to cut the stream short.
+    feed() returns the reason the guard tripped ('budget', 'loop', 'deadline' or
+    'cancelled', once `cancel_event` is set), or None while the stream is healthy.
+    Tokens are approximated as words and punctuation marks.
+    """
+
+    def __init__(self, max_chars: int = STREAM_MAX_CHARS, max_tokens: int = STREAM_MAX_TOKENS,
+                 deadline_seconds: float = STREAM_DEADLINE_SECONDS,
+                 loop_max_ngram: int = STREAM_LOOP_MAX_NGRAM, loop_min_repeats: int = STREAM_LOOP_MIN_REPEATS,
+                 cancel_event=None):
+        self.max_chars = max_chars
+        self.max_tokens = max_tokens
+        self.deadline = time.monotonic() + deadline_seconds
+        self.loop_max_ngram = loop_max_ngram
+        self.loop_min_repeats = loop_min_repeats
+        self.cancel_event = cancel_event
+        self.parts = []
+        self.char_count = 0
+        self.token_count = 0
+        self.tripped = None
+        # Only the tail of the token stream is needed to spot a loop.
+        self._tail = []
+        self._tail_size = loop_max_ngram * loop_min_repeats
+        self._partial = ""
+
+    @property
+    def text(self) -> str:
+        return "".join(self.parts)
+
+    def check_deadline(self):
+        """Trips the guard if the wall-clock deadline has passed or the caller cancelled."""
+        if not self.tripped:
+            if self.cancel_event is not None and self.cancel_event.is_set():
+                self.tripped = "cancelled"
+            elif time.monotonic() > self.deadline:
+                self.tripped = "deadline"
+        return self.tripped
+
+    def feed(self, chunk: str):
+        """Adds a chunk of streamed text and returns the trip reason, if any."""
+        if self.tripped:
+            return self.tripped
+        self.parts.append(chunk)
+        self.char_count += len(chunk)
+
+        # A token may straddle two chunks, so hold back the trailing word until the next one.
+        tokens = _TOKEN_RE.findall(self._partial + chunk)
+        self._partial = ""
+        if tokens and chunk and not chunk[-1].isspace() and tokens[-1][-1].isalnum():
+            self._partial = tokens.pop()
+        self.token_count += len(tokens)
+        self._tail = (self._tail + tokens)[-self._tail_size:]
+
+        if self.char_count > self.max_chars or self.token_count > self.max_tokens:
+            self.tripped = "budget"
+        elif self._has_loop():
+            self.tripped = "loop"
+        else:
+            self.check_deadline()
+        return self.tripped
+
+    def _has_loop(self) -> bool:
+        tail = self._tail
+        for n in range(1, self.loop_max_ngram + 1):
+            span = n * self.loop_min_repeats
+            if len(tail) >= span and tail[-span:] == tail[-n:] * self.loop_min_repeats:
+                return True
+        return False
+
+    def loop_free_text(self) -> str:
+        """Returns the text with a trailing repeated loop trimmed off."""
+        text = self.text
+        if self.tripped != "loop":
+            return text
+        # Strip the repeating unit from the end of the text.
+        for n in range(1, self.loop_max_ngram + 1):
+            unit = self._tail[-n:]
+            if self._tail[-n * self.loop_min_repeats:] == unit * self.loop_min_repeats:
+                pattern = r"(?:\s*" + r"\s*".join(re.escape(tok) for tok in unit) + r")+\s*$"
+                return re.sub(pattern, "", text)
+        return text
+
+
+def consume_stream(stream, guard: StreamGuard, on_chunk=None, extractor=None):
+    """
+    Iterates a Letta message stream, feeding assistant text into `guard`.
+    `on_chunk(chunk)` is called for every chunk (e.g. to record tool calls).
+    If an `extractor` (see reaction_parser) is given, the stream also ends as soon
+    as it finds a complete reaction object.
+    Closes the stream as soon as the guard trips and returns the trip reason.
+    """
+    try:
+        for chunk in stream:
+            if on_chunk:
+                on_chunk(chunk)
+            if chunk.message_type == "assistant_message" and chunk.content:
+                reason = guard.feed(chunk.content)
+                if extractor and extractor.feed(chunk.content) is not None:
+                    return None
+            else:
+                reason = guard.check_deadline()
+            if reason:
+                return reason
+        return None
+    finally:
+        # Closing the generator releases the underlying HTTP response early.
+        close = getattr(stream, "close", None)
+        if close:
+            close()
@@ -1,5 +1,9 @@
 import os
+import re
 import json
+import math
+import time
+import sqlite3
 
 def agent_like_ad(agent_id: str, ad_id: str, **kwargs) -> str:
     """
@@ -69,20 +73,199 @@ def agent_ignore_ad(agent_id: str, ad_id: str, **kwargs) -> str:
     """
     return json.dumps({"status": "success", "action": "ignore", "agent": agent_id, "ad": ad_id})
 
-def read_shared_knowledge(**kwargs) -> str:
+# The shared knowledge base is an SQLite database in WAL mode, so many agents can append
+# and read concurrently: every write is an atomic INSERT and reads are index range scans
+# that cost the same however large the base grows. The legacy text file seeds a new base.
+# Entries are also kept in a TF-IDF inverted index (postings per term, document frequency
+# per term) that is updated on every write, so a read can return only the top-k entries
+# relevant to a query instead of the whole base.
+SHARED_KNOWLEDGE_DB = os.path.join(os.path.dirname(__file__), '..', 'data', 'shared_knowledge.db')
+SHARED_KNOWLEDGE_SEED = os.path.join(os.path.dirname(__file__), '..', 'data', 'shared_knowledge.txt')
+SHARED_KNOWLEDGE_MAX_ENTRIES = int(os.getenv("SHARED_KNOWLEDGE_MAX_ENTRIES", "10000"))
+SHARED_KNOWLEDGE_PAGE_SIZE = 20
+SHARED_KNOWLEDGE_TOP_K = 5
+# Very common terms are capped so a query never scans more than this many postings per term.
+SHARED_KNOWLEDGE_MAX_POSTINGS = 2000
+# Bumped whenever _init_knowledge_db changes; stored in the database's user_version.
+SHARED_KNOWLEDGE_SCHEMA_VERSION = 1
+_knowledge_db_ready = False
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "for", "from", "has", "have", "i", "in",
+    "is", "it", "its", "me", "my", "of", "on", "or", "so", "that", "the", "this", "to", "was", "we",
+    "were", "what", "with", "you", "your",
+}
+
+def _terms(text: str) -> list:
+    """Lowercased word terms of a text, without stopwords and with plural 's' stripped."""
+    terms = []
+    for t in re.findall(r"[a-z0-9]+", (text or "").lower()):
+        if len(t) < 2 or t in STOPWORDS:
+            continue
+        if len(t) > 3 and t.endswith("s") and not t.endswith("ss"):
+            t = t[:-1]
+        terms.append(t)
+    return terms
+
+def _index_entry(conn, entry_id: int, content: str):
+    """Adds an entry's term frequencies to the inverted index."""
+    terms = _terms(content)
+    counts = {}
+    for term in terms:
+        counts[term] = counts.get(term, 0) + 1
+    conn.executemany(
+        "INSERT OR IGNORE INTO postings (term, entry_id, tf) VALUES (?, ?, ?)",
+        [(term, entry_id, count / len(terms)) for term, count in counts.items()],
+    )
+    conn.executemany(
+        "INSERT INTO terms (term, df) VALUES (?, 1) ON CONFLICT(term) DO UPDATE SET df = df + 1",
+        [(term,) for term in counts],
+    )
+    conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'entry_count'")
+    conn.execute("UPDATE meta SET value = MAX(value, ?) WHERE key = 'indexed_through'", (entry_id,))
+
+def _add_entry(conn, content: str) -> int:
+    """Inserts and indexes one entry inside the caller's transaction."""
+    entry_id = conn.execute(
+        "INSERT INTO entries (content, created_at) VALUES (?, ?)", (content, time.time())
+    ).lastrowid
+    _index_entry(conn, entry_id, content)
+    return entry_id
+
+def _compact(conn, keep_after: int):
+    """Deletes entries with id <= keep_after, along with their postings."""
+    conn.execute(
+        "UPDATE terms SET df = df - (SELECT COUNT(*) FROM postings p WHERE p.term = terms.term AND p.entry_id <= ?)"
+        " WHERE term IN (SELECT DISTINCT term FROM postings WHERE entry_id <= ?)",
+        (keep_after, keep_after),
+    )
+    conn.execute("DELETE FROM terms WHERE df <= 0")
+    conn.execute("DELETE FROM postings WHERE entry_id <= ?", (keep_after,))
+    removed = conn.execute("DELETE FROM entries WHERE id <= ?", (keep_after,)).rowcount
+    conn.execute("UPDATE meta SET value = value - ? WHERE key = 'entry_count'", (removed,))
+
+def _init_knowledge_db(conn):
+    """Creates, seeds and indexes the database, then stamps it with the schema version."""
+    conn.execute("PRAGMA journal_mode=WAL")
+    # Take the write lock before looking at anything, so two processes opening a new
+    # database at once can't both find it unseeded; the second one waits, then sees
+    # the version the first one stamped and leaves it alone.
+    conn.execute("BEGIN IMMEDIATE")
+    with conn:
+        (version,) = conn.execute("PRAGMA user_version").fetchone()
+        if version >= SHARED_KNOWLEDGE_SCHEMA_VERSION:
+            return
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, content TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS postings ("
+            " term TEXT NOT NULL, entry_id INTEGER NOT NULL, tf REAL NOT NULL,"
+            " PRIMARY KEY (term, entry_id)) WITHOUT ROWID"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS postings_entry ON postings(entry_id)")
+        conn.execute("CREATE TABLE IF NOT EXISTS terms (term TEXT PRIMARY KEY, df INTEGER NOT NULL) WITHOUT ROWID")
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('entry_count', 0), ('indexed_through', 0)")
+
+        if conn.execute("SELECT 1 FROM sqlite_sequence WHERE name = 'entries'").fetchone() is None:
+            try:
+                with open(SHARED_KNOWLEDGE_SEED, 'r') as f:
+                    seed = [line.strip() for line in f if line.strip()]
+            except FileNotFoundError:
+                seed = []
+            for line in seed:
+                _add_entry(conn, line)
+
+        # Index any entries written before the index existed.
+        (indexed_through,) = conn.execute("SELECT value FROM meta WHERE key = 'indexed_through'").fetchone()
+        for entry_id, content in conn.execute(
+            "SELECT id, content FROM entries WHERE id > ? ORDER BY id", (indexed_through,)
+        ).fetchall():
+            _index_entry(conn, entry_id, content)
+        conn.execute(f"PRAGMA user_version = {SHARED_KNOWLEDGE_SCHEMA_VERSION}")
+
+def _knowledge_db():
+    """
+    Opens the shared knowledge database. Only the first open in a process checks the
+    schema version (a read), and sets the database up if it is older; later opens run
+    no statements, so reads never wait on or take a write lock.
+    """
+    global _knowledge_db_ready
+    conn = sqlite3.connect(SHARED_KNOWLEDGE_DB, timeout=30)
+    if not _knowledge_db_ready:
+        (version,) = conn.execute("PRAGMA user_version").fetchone()
+        if version < SHARED_KNOWLEDGE_SCHEMA_VERSION:
+            _init_knowledge_db(conn)
+        _knowledge_db_ready = True
+    return conn
+
+def _search(conn, query: str, top_k: int) -> list:
+    """Returns the top_k (id, content) entries by TF-IDF score against the query."""
+    (entry_count,) = conn.execute("SELECT value FROM meta WHERE key = 'entry_count'").fetchone()
+    scores = {}
+    for term in set(_terms(query)):
+        row = conn.execute("SELECT df FROM terms WHERE term = ?", (term,)).fetchone()
+        if not row:
+            continue
+        idf = math.log((entry_count + 1) / (row[0] + 1)) + 1
+        for entry_id, tf in conn.execute(
+            "SELECT entry_id, tf FROM postings WHERE term = ? ORDER BY entry_id DESC LIMIT ?",
+            (term, SHARED_KNOWLEDGE_MAX_POSTINGS),
+        ):
+            scores[entry_id] = scores.get(entry_id, 0.0) + tf * idf
+    best = sorted(scores, key=lambda entry_id: (scores[entry_id], entry_id), reverse=True)[:top_k]
+    if not best:
+        return []
+    placeholders = ",".join("?" * len(best))
+    contents = dict(conn.execute(f"SELECT id, content FROM entries WHERE id IN ({placeholders})", best).fetchall())
+    return [(entry_id, contents[entry_id]) for entry_id in best if entry_id in contents]
+
+def _as_int(value, default: int) -> int:
+    """Reads a tool argument as an int (agents may pass "10", 10.0 or junk), else returns default."""
+    try:
+        return int(float(value))
+    except (TypeError, ValueError, OverflowError):
+        return default
+
+def read_shared_knowledge(query: str = "", offset: int = 0, limit: int = 0, **kwargs) -> str:
     """
     Reads the shared knowledge base accessible to all agents.
     Use this to understand collective trends or shared personality traits.
+    Pass a query (for example the ad text) to get only the most relevant entries.
+    Without a query it returns the most recent entries; pass the returned
+    next_offset to read only entries added since then.
+
+    Args:
+        query (str): Text to find relevant entries for. Returns the top `limit` matches by relevance.
+        offset (int): Only return entries with an id greater than this. 0 returns the latest entries.
+        limit (int): The maximum number of entries to return (default 5 with a query, else 20).
 
     Returns:
-        str: The content of the shared knowledge file.
+        str: A JSON string with the entries ("id", "content") and the next_offset to read from.
     """
-    SHARED_KNOWLEDGE_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'shared_knowledge.txt')
+    default_limit = SHARED_KNOWLEDGE_TOP_K if query else SHARED_KNOWLEDGE_PAGE_SIZE
+    limit = max(1, min(_as_int(limit, default_limit) or default_limit, 100))
+    offset = max(0, _as_int(offset, 0))
+    conn = _knowledge_db()
     try:
-        with open(SHARED_KNOWLEDGE_PATH, 'r') as f:
-            return f.read()
-    except FileNotFoundError:
-        return "No shared knowledge found."
+        if query:
+            rows = _search(conn, query, limit)
+        elif offset:
+            rows = conn.execute(
+                "SELECT id, content FROM entries WHERE id > ? ORDER BY id LIMIT ?", (offset, limit)
+            ).fetchall()
+        else:
+            rows = conn.execute("SELECT id, content FROM entries ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+            rows.reverse()
+    finally:
+        conn.close()
+    if not rows:
+        return json.dumps({"entries": [], "next_offset": offset, "message": "No shared knowledge found."})
+    return json.dumps({
+        "entries": [{"id": row_id, "content": content} for row_id, content in rows],
+        "next_offset": max(row_id for row_id, _ in rows),
+    })
 
 def write_shared_knowledge(content: str, **kwargs) -> str:
     """
@@ -95,9 +278,15 @@ def write_shared_knowledge(content: str, **kwargs) -> str:
     Returns:
         str: A confirmation message.
     """
-    SHARED_KNOWLEDGE_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'shared_knowledge.txt')
-    with open(SHARED_KNOWLEDGE_PATH, 'a') as f:
-        f.write(f"\n{content}")
+    conn = _knowledge_db()
+    try:
+        with conn:
+            entry_id = _add_entry(conn, content)
+            # Compact now and then: keep only the newest SHARED_KNOWLEDGE_MAX_ENTRIES entries.
+            if entry_id % 100 == 0:
+                _compact(conn, entry_id - SHARED_KNOWLEDGE_MAX_ENTRIES)
+    finally:
+        conn.close()
     return "Shared knowledge updated successfully."
 
 # A list of all tool functions for easy registration
@@ -29,7 +29,7 @@ function App() {
       <main>
         {isLoading && <div className="loader"></div>}
         
-        {!isLoading && results.length > 0 && (
+        {results.length > 0 && (
           <ResultsDisplay results={results} />
         )}
       </main>
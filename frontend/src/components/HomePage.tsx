@@ -45,8 +45,17 @@ const HomePage: React.FC<HomePageProps> = ({ setResults, isLoading, setIsLoading
                 const errData = await response.json();
                 throw new Error(errData.detail || `Failed to ${action} agents.`);
             }
-            const data = await response.json();
-            alert(data.message);
+            // The upload is queued as a background job; poll until it finishes.
+            const { job_id } = await response.json();
+            let job;
+            do {
+                await new Promise((resolve) => setTimeout(resolve, 2000));
+                job = await (await fetch(`http://localhost:8000/jobs/${job_id}`)).json();
+            } while (job.status === 'queued' || job.status === 'running');
+            if (job.status === 'failed') {
+                throw new Error(job.error || `Failed to ${action} agents.`);
+            }
+            alert(job.result.message);
         } catch (err: any) {
             alert(err.message);
             console.error(err);
@@ -31,23 +31,27 @@ const SimulationController: React.FC<SimulationControllerProps> = ({ setResults,
     setError(null);
     setResults([]);
 
-    try {
-      const response = await fetch(`http://localhost:8000/simulate?ad_copy=${encodeURIComponent(content)}`, {
-        method: 'POST',
-      });
+    // Results arrive one agent at a time over Server-Sent Events.
+    const collected: PersonaResult[] = [];
+    const source = new EventSource(`http://localhost:8000/simulate/stream?ad_copy=${encodeURIComponent(content)}`);
 
-      if (!response.ok) {
-        const errData = await response.json();
-        throw new Error(errData.detail || 'Failed to run simulation.');
+    source.addEventListener('result', (event) => {
+      const data = JSON.parse((event as MessageEvent).data);
+      if (data.result) {
+        collected.push(data.result);
+        setResults([...collected]);
       }
-      const results: PersonaResult[] = await response.json();
-      setResults(results);
-    } catch (err: any) {
-      setError(err.message);
-      console.error(err);
-    } finally {
+    });
+    source.addEventListener('done', () => {
+      source.close();
       setIsLoading(false);
-    }
+    });
+    source.addEventListener('error', (event) => {
+      const data = (event as MessageEvent).data;
+      setError(data ? JSON.parse(data).detail : 'Failed to run simulation.');
+      source.close();
+      setIsLoading(false);
+    });
   }, [content, setIsLoading, setResults]);
   
   const handleReset = () => {